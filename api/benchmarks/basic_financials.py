@@ -0,0 +1,53 @@
+import sys
+import json
+import copy
+import timeit
+from api.benchmarks.fake_upstream import fake_basic_financials
+from api.services.finnhub import FinnhubUtils
+
+## Compares the old get_basic_financials pipeline (merge every series, filter, json.dumps
+## in the service, json.loads in the handler) with filtering before the merge and with
+## filtering a precomputed latest-value index, on a large Finnhub-shaped payload.
+SELECTED = ["series1", "series7", "metric3", "metric42", "missing"]
+
+def legacy(payload: dict, selected_columns) -> dict:
+    output_dict = payload["metric"]
+    for metric, value_list in payload["series"]["quarterly"].items():
+        if value_list:
+            output_dict.update({metric: value_list[0]["v"]})
+    if selected_columns:
+        output_dict = {k: v for k, v in output_dict.items() if k in selected_columns}
+    return json.loads(json.dumps(output_dict, indent=2))
+
+class RecordedClient:
+    def __init__(self, payload: dict):
+        self.payload = payload
+
+    def company_basic_financials(self, symbol, metric):
+        return self.payload
+
+def bench(label: str, func, number: int) -> float:
+    seconds = timeit.timeit(func, number=number) / number
+    print(f"  {label:<42} {seconds * 1e6:10.1f} us/call")
+    return seconds
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    payload = fake_basic_financials(metric_count=130, series_count=120, periods=160)
+    print(f"payload: {len(json.dumps(payload)) / 1e6:.1f} MB, {number} calls each")
+
+    fin = FinnhubUtils.__new__(FinnhubUtils)
+    fin.finnhub_client = RecordedClient(payload)
+    index = FinnhubUtils.latest_metric_index(payload)
+    assert legacy(copy.deepcopy(payload), SELECTED) == FinnhubUtils.select_metrics(index, SELECTED)
+
+    print("selected columns:")
+    old = bench("legacy merge + filter + json round-trip", lambda: legacy(dict(payload, metric=dict(payload["metric"])), SELECTED), number)
+    cold = bench("filter before merge", lambda: fin.get_basic_financials("FAKE", SELECTED), number)
+    warm = bench("select from precomputed index", lambda: FinnhubUtils.select_metrics(index, SELECTED), number)
+    print(f"  speedup: {old / cold:.0f}x cold, {old / warm:.0f}x with the cached index")
+
+    print("all columns:")
+    old = bench("legacy merge + json round-trip", lambda: legacy(dict(payload, metric=dict(payload["metric"])), None), number)
+    warm = bench("select from precomputed index", lambda: FinnhubUtils.select_metrics(index, None), number)
+    print(f"  speedup: {old / warm:.0f}x with the cached index")
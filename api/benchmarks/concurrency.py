@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import asyncio
+from api.benchmarks.fake_upstream import FakeFinnhubServer
+
+## Fires concurrent requests at the /api/py/get_company_profile handler against a local
+## fake Finnhub. get_company_profile makes two upstream calls, so a single request takes
+## about 2 x latency; with a non-blocking upstream layer N concurrent requests should take
+## about the same wall time instead of N x 2 x latency.
+API_KEY = "benchmark-key"
+
+async def blocking_handler(symbol: str):
+    """The pre-async handler: calls the blocking client directly inside the coroutine."""
+    from api.services.finnhub import FinnhubUtils
+    return FinnhubUtils(API_KEY).get_company_profile(symbol)
+
+async def timed_gather(factory, requests: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(factory(f"SYM{i}") for i in range(requests)))
+    return time.perf_counter() - start
+
+async def main(requests: int, latency: float):
+    from api.main import get_company_profile
+    from api.services.clients import finnhub_clients
+
+    async def async_handler(symbol: str):
+        return await get_company_profile(symbol, x_finnhub_api_key=API_KEY)
+
+    blocking = await timed_gather(blocking_handler, requests)
+    non_blocking = await timed_gather(async_handler, requests)
+
+    print(f"{requests} concurrent requests, upstream latency {latency * 1000:.0f} ms per call")
+    print(f"  blocking handler:     {blocking:.2f} s")
+    print(f"  async upstream layer: {non_blocking:.2f} s")
+    print(f"  speedup:              {blocking / non_blocking:.1f}x")
+    print(f"  finnhub client registry: {finnhub_clients.stats()}")
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    with FakeFinnhubServer(latency=latency) as server:
+        os.environ["FINNHUB_API_URL"] = server.api_url
+        # Measure the upstream layer, not the free-plan quota
+        os.environ.setdefault("FINNHUB_CALLS_PER_MINUTE", "1000000000")
+        os.environ.setdefault("FINNHUB_BURST", "1000000000")
+        asyncio.run(main(requests, latency))
@@ -0,0 +1,174 @@
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Annotated, Optional
+from collections import defaultdict, deque
+from urllib.parse import urlparse, parse_qs
+
+## Minimal local stand-in for the Finnhub REST API, used by the benchmarks in this package.
+## Every response is delayed by `latency` seconds to mimic a slow upstream.
+PROFILE = {
+    "name": "Fake Corp",
+    "finnhubIndustry": "Technology",
+    "country": "US",
+    "ipo": "1999-01-01",
+    "marketCapitalization": 123456.78,
+    "currency": "USD",
+    "shareOutstanding": 1000.0,
+    "ticker": "FAKE",
+    "exchange": "NASDAQ NMS - GLOBAL MARKET",
+}
+
+QUOTE = {"c": 101.25, "h": 102.0, "l": 99.5, "o": 100.0, "pc": 100.5}
+
+FILINGS = [
+    {
+        "accessNumber": "0000000000-24-000001",
+        "symbol": "FAKE",
+        "cik": "0000000",
+        "form": "10-K",
+        "filedDate": "2024-02-01 00:00:00",
+        "acceptedDate": "2024-02-01 00:00:00",
+        "reportUrl": "https://www.sec.gov/Archives/edgar/data/0000000/fake-10k.htm",
+        "filingUrl": "https://www.sec.gov/Archives/edgar/data/0000000/fake-index.htm",
+    }
+]
+
+def fake_news(count: int = 50) -> list:
+    now = int(time.time())
+    return [
+        {
+            "datetime": now - i * 3600,
+            "headline": f"Fake Corp headline {i}",
+            "url": f"https://news.example.com/fake/{i}",
+            "source": "Example",
+            "summary": f"Summary of headline {i}.",
+        }
+        for i in range(count)
+    ]
+
+def fake_basic_financials(metric_count: int = 130, series_count: int = 40, periods: int = 80) -> dict:
+    metric = {f"metric{i}": float(i) for i in range(metric_count)}
+    series = {
+        freq: {
+            f"series{i}": [
+                {"period": f"{2024 - p // 4}-{12 - (p % 4) * 3:02d}-30", "v": float(p + i)}
+                for p in range(periods)
+            ]
+            for i in range(series_count)
+        }
+        for freq in ("annual", "quarterly")
+    }
+    return {"metric": metric, "series": series, "symbol": "FAKE", "metricType": "all"}
+
+def fake_financials(line_items: int = 45, periods: int = 5, seed: int = 0) -> "pd.DataFrame":
+    """Stand-in for yf.Ticker.financials: line items as rows, fiscal year ends as columns, some values missing."""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    values = rng.normal(1e9, 5e8, size=(line_items, periods))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    columns = pd.to_datetime([f"{2024 - i}-09-30" for i in range(periods)])
+    return pd.DataFrame(values, index=[f"Line Item {i}" for i in range(line_items)], columns=columns)
+
+ROUTES = {
+    "/stock/profile2": lambda: PROFILE,
+    "/quote": lambda: QUOTE,
+    "/company-news": fake_news,
+    "/stock/metric": fake_basic_financials,
+    "/stock/filings": lambda: FILINGS,
+}
+
+class FakeFinnhubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    # Like Finnhub, answer 429 once a token makes more than `quota_per_second` calls in a second
+    quota_per_second = None
+    calls = None
+    calls_lock = None
+    counters = None
+
+    def _over_quota(self, token: str) -> bool:
+        if self.quota_per_second is None:
+            return False
+        now = time.monotonic()
+        with self.calls_lock:
+            window = self.calls[token]
+            while window and now - window[0] >= 1:
+                window.popleft()
+            if len(window) >= self.quota_per_second:
+                self.counters["rejected"] += 1
+                return True
+            window.append(now)
+            self.counters["served"] += 1
+            return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        # finnhub.Client joins API_URL and path with an extra slash
+        path = "/" + url.path.removeprefix("/api/v1").lstrip("/")
+        token = parse_qs(url.query).get("token", [""])[0]
+        if self._over_quota(token):
+            self._reply(429, {"error": "API limit reached. Please try again later."})
+            return
+        route = ROUTES.get(path)
+        time.sleep(self.latency)
+        if route is None:
+            self._reply(404, {"error": f"unknown route {path}"})
+        else:
+            self._reply(200, route())
+
+    def _reply(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 makes bursts of new connections wait for a 1 s SYN retry
+    request_queue_size = 128
+
+class FakeFinnhubServer:
+    def __init__(
+        self,
+        latency: Annotated[float, "seconds to wait before every response"] = 0.2,
+        port: int = 0,
+        handler: Optional[type] = None,
+        quota_per_second: Annotated[Optional[int], "calls per second allowed per API token, None for unlimited"] = None,
+    ):
+        self.counters = {"served": 0, "rejected": 0}
+        handler_cls = type("Handler", (handler or FakeFinnhubHandler,), {
+            "latency": latency,
+            "quota_per_second": quota_per_second,
+            "calls": defaultdict(deque),
+            "calls_lock": threading.Lock(),
+            "counters": self.counters,
+        })
+        self.httpd = FakeHTTPServer(("127.0.0.1", port), handler_cls)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def api_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    with FakeFinnhubServer(port=port) as server:
+        print(f"Fake Finnhub listening on {server.api_url}")
+        threading.Event().wait()
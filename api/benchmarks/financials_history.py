@@ -0,0 +1,36 @@
+import sys
+import timeit
+from collections import defaultdict
+import pandas as pd
+from api.benchmarks.fake_upstream import fake_basic_financials
+from api.services.finnhub import FinnhubUtils
+from api.utils.index import to_columnar
+
+## Compares the old get_basic_financials_history loop (per-value dict updates and string
+## date comparisons) with the columnar NumPy build, on a multi-decade quarterly payload.
+START, END = "1990-01-01", "2024-12-31"
+
+def legacy(series: dict) -> pd.DataFrame:
+    output_dict = defaultdict(dict)
+    for metric, value_list in series.items():
+        for value in value_list:
+            if START <= value["period"] <= END:
+                output_dict[metric].update({value["period"]: value["v"]})
+    return pd.DataFrame(output_dict).rename_axis(index="date")
+
+def columnar(series: dict) -> dict:
+    return to_columnar(FinnhubUtils.slice_history(FinnhubUtils.series_frame(series), START, END))
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    series = fake_basic_financials(series_count=120, periods=160)["series"]["quarterly"]
+    frame = FinnhubUtils.series_frame(series)
+    print(f"{len(series)} metrics x {frame.shape[0]} quarters, {number} calls each")
+
+    for label, func in [
+        ("legacy loop + DataFrame", lambda: legacy(series)),
+        ("NumPy build + mask + columnar JSON", lambda: columnar(series)),
+        ("mask + columnar JSON on a cached frame", lambda: to_columnar(FinnhubUtils.slice_history(frame, START, END))),
+    ]:
+        seconds = timeit.timeit(func, number=number) / number
+        print(f"  {label:<40} {seconds * 1e3:8.2f} ms/call")
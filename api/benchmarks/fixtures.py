@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from typing import Annotated, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qsl
+import pandas as pd
+from api.benchmarks.fake_upstream import FILINGS, PROFILE, QUOTE, FakeFinnhubHandler, FakeFinnhubServer, fake_basic_financials, fake_financials, fake_news
+from api.services.yfinance import YFinanceUtils
+
+## Record/replay of upstream responses. `record` calls the real Finnhub, sec-api.io and
+## Yahoo Finance once and writes what they answered to a fixtures directory; `ReplayServer`
+## then serves the Finnhub and sec-api.io fixtures over HTTP and `ReplayYFinanceUtils`
+## serves the Yahoo ones in-process, with configurable latency and injected errors.
+##
+## Finnhub and sec-api.io are recorded at the HTTP level, so replays still exercise the
+## finnhub client, the rate limiter and the retries. yfinance scrapes Yahoo with cookies and
+## crumbs, so its fixtures are the `Ticker.financials` frames it returns instead.
+FIXTURES_DIR = os.getenv("FIXTURES_DIR", str(Path(__file__).parent / "fixtures"))
+
+# Query parameters left out of fixture keys: the API key, and date windows that move every day
+SECRET_PARAMS = {"token"}
+DATE_PARAMS = {"from", "to"}
+
+class FixtureStore:
+    """One JSON file per recorded response: <root>/<provider>/<hash of the request>.json"""
+
+    def __init__(self, root: Annotated[str, "fixtures directory"] = FIXTURES_DIR):
+        self.root = Path(root)
+        self._loose: Optional[Dict[tuple, Path]] = None
+        self._read_cache: Dict[Path, dict] = {}
+
+    @staticmethod
+    def request_key(path: str, params: Dict[str, str], ignore: set = frozenset()) -> str:
+        kept = sorted((name, value) for name, value in params.items() if name not in SECRET_PARAMS | ignore)
+        return hashlib.sha256(json.dumps([path, kept]).encode()).hexdigest()[:24]
+
+    def _path(self, provider: str, name: str) -> Path:
+        return self.root / provider / f"{name}.json"
+
+    def save(self, provider: str, path: str, params: Dict[str, str], status: int, body) -> None:
+        params = {name: value for name, value in params.items() if name not in SECRET_PARAMS}
+        target = self._path(provider, self.request_key(path, params))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps({"path": path, "params": params, "status": status, "body": body, "recorded_at": time.time()}))
+        self._loose = None
+        self._read_cache.pop(target, None)
+
+    def _read(self, file: Path) -> dict:
+        # Parse and encode every fixture once, so replaying costs no more than sending bytes
+        fixture = self._read_cache.get(file)
+        if fixture is None:
+            fixture = json.loads(file.read_text())
+            body = fixture["body"]
+            fixture["encoded"] = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+            self._read_cache[file] = fixture
+        return fixture
+
+    def _load_loose(self) -> Dict[tuple, Path]:
+        # Newest recording per (provider, path, params without dates) and per (provider, path)
+        loose = {}
+        files = sorted(self.root.glob("*/*.json"), key=lambda file: file.stat().st_mtime)
+        for file in files:
+            if file.parent.name == "yfinance":
+                continue
+            fixture = json.loads(file.read_text())
+            provider = file.parent.name
+            loose[(provider, self.request_key(fixture["path"], fixture["params"], DATE_PARAMS))] = file
+            loose[(provider, fixture["path"])] = file
+        return loose
+
+    def load(
+        self,
+        provider: Annotated[str, "'finnhub' or 'secapi'"],
+        path: str,
+        params: Dict[str, str],
+        strict: Annotated[bool, "only replay an exact match, instead of falling back to another recording of the same path"] = False,
+    ) -> Optional[dict]:
+        exact = self._path(provider, self.request_key(path, params))
+        if exact in self._read_cache or exact.exists():
+            return self._read(exact)
+        if self._loose is None:
+            self._loose = self._load_loose()
+        fallback = self._loose.get((provider, self.request_key(path, params, DATE_PARAMS)))
+        if fallback is None and not strict:
+            fallback = self._loose.get((provider, path))
+        return self._read(fallback) if fallback else None
+
+    def save_financials(self, symbol: str, frame: pd.DataFrame) -> None:
+        target = self._path("yfinance", symbol.upper())
+        target.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "index": [str(item) for item in frame.index],
+            "columns": [column.isoformat() for column in pd.DatetimeIndex(frame.columns)],
+            "data": [[None if pd.isna(value) else float(value) for value in row] for row in frame.to_numpy()],
+        }
+        target.write_text(json.dumps(payload))
+
+    def load_financials(self, symbol: str, strict: bool = False) -> Optional[pd.DataFrame]:
+        target = self._path("yfinance", symbol.upper())
+        if not target.exists():
+            recorded = sorted((self.root / "yfinance").glob("*.json"))
+            if strict or not recorded:
+                return None
+            target = recorded[0]
+        payload = json.loads(target.read_text())
+        return pd.DataFrame(payload["data"], index=payload["index"], columns=pd.DatetimeIndex(payload["columns"]), dtype=float)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.root.glob("*/*.json"))
+
+class FaultInjector:
+    def __init__(
+        self,
+        latency: Annotated[float, "seconds added to every response"] = 0.0,
+        jitter: Annotated[float, "extra uniformly distributed latency, in seconds"] = 0.0,
+        error_rate: Annotated[float, "share of responses replaced by an error"] = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {"served": 0, "injected_errors": 0, "missing": 0}
+
+    def delay(self) -> None:
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+        time.sleep(self.latency + jitter)
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            self.counters["injected_errors" if failed else "served"] += 1
+        return failed
+
+class ReplayHandler(FakeFinnhubHandler):
+    store: FixtureStore = None
+    faults: FaultInjector = None
+    error_status = 503
+    strict = False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        if url.path.startswith("/extractor"):
+            provider, path = "secapi", "/extractor"
+        else:
+            # finnhub.Client joins API_URL and path with an extra slash
+            provider, path = "finnhub", "/" + url.path.removeprefix("/api/v1").lstrip("/")
+
+        self.faults.delay()
+        if self.faults.should_fail():
+            self._reply(self.error_status, {"error": "Injected upstream error."})
+            return
+        fixture = self.store.load(provider, path, params, self.strict)
+        if fixture is None:
+            self.faults.counters["missing"] += 1
+            self._reply(404, {"error": f"No fixture recorded for {provider} {path} {params}"})
+        else:
+            content_type = "text/plain; charset=utf-8" if provider == "secapi" else "application/json"
+            self._reply_bytes(fixture["status"], fixture["encoded"], content_type)
+
+    def _reply_bytes(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class ReplayServer(FakeFinnhubServer):
+    """Local stand-in for Finnhub and sec-api.io serving recorded fixtures.
+
+    Point the app at it with FINNHUB_API_URL=server.api_url and SEC_API_EXTRACTOR_URL=server.sec_api_url.
+    """
+
+    def __init__(self, store: FixtureStore, faults: Optional[FaultInjector] = None, error_status: int = 503, strict: bool = False, port: int = 0):
+        super().__init__(latency=0.0, port=port, handler=ReplayHandler)
+        self.store = store
+        self.faults = faults or FaultInjector()
+        handler = self.httpd.RequestHandlerClass
+        handler.store = store
+        handler.faults = self.faults
+        handler.error_status = error_status
+        handler.strict = strict
+
+    @property
+    def sec_api_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/extractor"
+
+class ReplayTicker:
+    """Stand-in for yf.Ticker serving a recorded `financials` frame."""
+
+    def __init__(self, frame: Optional[pd.DataFrame], faults: FaultInjector):
+        self._frame = frame
+        self.faults = faults
+
+    @property
+    def financials(self) -> pd.DataFrame:
+        self.faults.delay()
+        if self.faults.should_fail():
+            raise RuntimeError("Injected upstream error.")
+        # Like yfinance for an unknown symbol
+        return self._frame.copy() if self._frame is not None else pd.DataFrame()
+
+class ReplayYFinanceUtils(YFinanceUtils):
+    store: FixtureStore = None
+    faults: FaultInjector = None
+    strict = False
+
+    def init_yfinance_client(self, symbol: str) -> ReplayTicker:
+        return ReplayTicker(self.store.load_financials(symbol, self.strict), self.faults)
+
+def replay_yfinance_utils(store: FixtureStore, faults: FaultInjector, strict: bool = False) -> type:
+    """YFinanceUtils class to use as the yfinance client factory, e.g. `yfinance_clients.factory = replay_yfinance_utils(...)`."""
+    return type("ReplayYFinanceUtils", (ReplayYFinanceUtils,), {"store": store, "faults": faults, "strict": strict})
+
+SYNTHETIC_SECTION = "\n\n".join(
+    f"Item {i}. " + " ".join(f"Synthetic 10-K sentence {j} of paragraph {i}." for j in range(40)) for i in range(60)
+)
+
+def seed_synthetic(store: FixtureStore, symbol: str = "FAKE") -> None:
+    """Fill a store with the synthetic payloads of fake_upstream, for when nothing was recorded yet."""
+    store.save("finnhub", "/stock/profile2", {"symbol": symbol}, 200, PROFILE)
+    store.save("finnhub", "/quote", {"symbol": symbol}, 200, QUOTE)
+    store.save("finnhub", "/company-news", {"symbol": symbol, "from": "2024-01-01", "to": "2024-01-02"}, 200, fake_news())
+    store.save("finnhub", "/stock/metric", {"symbol": symbol, "metric": "all"}, 200, fake_basic_financials())
+    store.save("finnhub", "/stock/filings", {"symbol": symbol, "form": "10-K", "from": "2024-01-01", "to": "2024-01-02"}, 200, FILINGS)
+    store.save("secapi", "/extractor", {"url": FILINGS[0]["reportUrl"], "item": "7", "type": "text"}, 200, SYNTHETIC_SECTION)
+    store.save_financials(symbol, fake_financials())
+
+def record(
+    store: FixtureStore,
+    symbols: List[str],
+    finnhub_api_key: Optional[str],
+    sec_api_key: Optional[str],
+    sections: List[str],
+) -> Tuple[int, int]:
+    """Call the real upstreams for every symbol and save their answers; returns (recorded, failed) calls."""
+    from api.services.finnhub import FinnhubUtils
+    from api.services.secapi import SecApiUtils
+
+    counts = {"recorded": 0, "failed": 0}
+
+    def save_response(response, *args, **kwargs):
+        url = urlparse(response.request.url)
+        path = "/" + url.path.split("/api/v1/", 1)[-1].lstrip("/")
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        store.save("finnhub", path, dict(parse_qsl(url.query)), response.status_code, body)
+        counts["recorded"] += 1
+
+    def attempt(func, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            counts["failed"] += 1
+            print(f"  {getattr(func, '__qualname__', func)}{args} failed: {e}")
+
+    finnhub_utils = FinnhubUtils(finnhub_api_key) if finnhub_api_key else None
+    if finnhub_utils:
+        finnhub_utils.finnhub_client._session.hooks["response"].append(save_response)
+    secapi_utils = SecApiUtils(sec_api_key) if sec_api_key else None
+
+    for symbol in symbols:
+        print(f"Recording {symbol}")
+        frame = attempt(YFinanceUtils(symbol).get_financials)
+        if frame is not None:
+            store.save_financials(symbol, frame)
+            counts["recorded"] += 1
+        if finnhub_utils is None:
+            continue
+        attempt(finnhub_utils.get_company_profile_data, symbol)
+        attempt(finnhub_utils.get_quote, symbol)
+        attempt(finnhub_utils.get_raw_company_news, symbol, *default_news_window())
+        attempt(finnhub_utils._fetch_basic_financials, symbol)
+        filing = attempt(finnhub_utils.get_sec_filing, symbol, "10-K", *default_filing_window())
+        if secapi_utils and filing and filing.get("reportUrl"):
+            for section in sections:
+                text = attempt(secapi_utils.get_10k_section, section, filing["reportUrl"])
+                if text is not None:
+                    store.save("secapi", "/extractor", {"url": filing["reportUrl"], "item": section, "type": "text"}, 200, text)
+                    counts["recorded"] += 1
+    return counts["recorded"], counts["failed"]
+
+def default_news_window() -> Tuple[str, str]:
+    from api.utils.index import today
+    return today(1), today()
+
+def default_filing_window() -> Tuple[str, str]:
+    from api.utils.index import today
+    return today(12), today()
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(prog="python -m api.benchmarks.fixtures", description="Record upstream fixtures, or replay them over HTTP.")
+    parser.add_argument("--dir", default=FIXTURES_DIR, help="fixtures directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="call the real upstreams once and save their responses (reads FINNHUB_API_KEY and SEC_API_KEY)")
+    record_parser.add_argument("symbols", nargs="+")
+    record_parser.add_argument("--sections", nargs="*", default=["1A", "7"], help="10-K sections to record")
+
+    serve_parser = commands.add_parser("serve", help="serve recorded Finnhub and sec-api.io fixtures")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--latency", type=float, default=0.0)
+    serve_parser.add_argument("--jitter", type=float, default=0.0)
+    serve_parser.add_argument("--error-rate", type=float, default=0.0)
+    serve_parser.add_argument("--error-status", type=int, default=503)
+    serve_parser.add_argument("--strict", action="store_true", help="answer 404 unless the exact request was recorded")
+
+    commands.add_parser("seed", help="write synthetic fixtures for symbol FAKE")
+
+    args = parser.parse_args(argv)
+    store = FixtureStore(args.dir)
+    if args.command == "record":
+        recorded, failed = record(store, args.symbols, os.getenv("FINNHUB_API_KEY"), os.getenv("SEC_API_KEY"), args.sections)
+        print(f"Recorded {recorded} responses into {store.root} ({failed} calls failed)")
+    elif args.command == "seed":
+        seed_synthetic(store)
+        print(f"Wrote synthetic fixtures into {store.root}")
+    else:
+        faults = FaultInjector(args.latency, args.jitter, args.error_rate)
+        with ReplayServer(store, faults, args.error_status, args.strict, args.port) as server:
+            print(f"Replaying {len(store)} fixtures from {store.root}")
+            print(f"  FINNHUB_API_URL={server.api_url}")
+            print(f"  SEC_API_EXTRACTOR_URL={server.sec_api_url}")
+            threading.Event().wait()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
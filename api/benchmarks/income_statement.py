@@ -0,0 +1,50 @@
+import sys
+import json
+import timeit
+import orjson
+from types import SimpleNamespace
+from fastapi.encoders import jsonable_encoder
+from api.benchmarks.fake_upstream import fake_financials
+from api.main import IncomeStatementResponse
+from api.services.yfinance import YFinanceUtils
+
+## Compares the per-period dict-of-dicts income statement (response model validation,
+## jsonable_encoder, standard json) with the columnar format encoded straight from its
+## NumPy buffers by orjson, for a multi-symbol payload.
+class FakeYFinanceUtils(YFinanceUtils):
+    def __init__(self, symbol: str, seed: int):
+        super().__init__(symbol)
+        self.frame = fake_financials(seed=seed)
+
+    def init_yfinance_client(self, symbol: str) -> SimpleNamespace:
+        return SimpleNamespace(financials=self.frame)
+
+def records_payload(statements: dict) -> bytes:
+    responses = [
+        IncomeStatementResponse.model_validate({"symbol": symbol, "income_statement": statement}).model_dump()
+        for symbol, statement in statements.items()
+    ]
+    # What JSONResponse used to do, with NaN written as (invalid JSON) NaN
+    return json.dumps(jsonable_encoder(responses)).encode()
+
+def columnar_payload(statements: dict) -> bytes:
+    return orjson.dumps(
+        [{"symbol": symbol, "income_statement": statement} for symbol, statement in statements.items()],
+        option=orjson.OPT_SERIALIZE_NUMPY,
+    )
+
+if __name__ == "__main__":
+    symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    utils = {f"SYM{i}": FakeYFinanceUtils(f"SYM{i}", i) for i in range(symbols)}
+    records = {symbol: yfin.get_income_stmt() for symbol, yfin in utils.items()}
+    columnar = {symbol: yfin.get_income_stmt_columnar() for symbol, yfin in utils.items()}
+
+    print(f"{symbols} symbols, {number} encodes each")
+    for label, func, statements in [
+        ("records + pydantic + json", records_payload, records),
+        ("columnar + orjson", columnar_payload, columnar),
+    ]:
+        size = len(func(statements))
+        seconds = timeit.timeit(lambda: func(statements), number=number) / number
+        print(f"  {label:<28} {size / 1024:8.1f} KiB {seconds * 1e3:8.2f} ms/encode")
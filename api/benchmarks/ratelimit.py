@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import asyncio
+from collections import Counter
+from fastapi import HTTPException
+from api.benchmarks.fake_upstream import FakeFinnhubServer
+
+## Bursts requests at the /api/py/get_company_news handler against a fake Finnhub that
+## enforces a per-key quota. Without the scheduler most calls fail with 429s; with it,
+## calls are paced under the quota and only the overflow is shed with a 503.
+API_KEY = "benchmark-key"
+
+async def burst(requests: int) -> Counter:
+    from api.main import get_company_news
+
+    async def one(i: int) -> str:
+        try:
+            await get_company_news(f"SYM{i}", x_finnhub_api_key=API_KEY)
+            return "200"
+        except HTTPException as e:
+            return f"{e.status_code} (Retry-After {e.headers.get('Retry-After')})" if e.headers else str(e.status_code)
+
+    return Counter(await asyncio.gather(*(one(i) for i in range(requests))))
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    quota = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with FakeFinnhubServer(latency=0.01, quota_per_second=quota) as server:
+        os.environ["FINNHUB_API_URL"] = server.api_url
+        os.environ.setdefault("FINNHUB_CALLS_PER_MINUTE", str(quota * 60))
+        os.environ.setdefault("FINNHUB_BURST", str(quota))
+        start = time.perf_counter()
+        statuses = asyncio.run(burst(requests))
+        elapsed = time.perf_counter() - start
+
+        from api.services.clients import schedulers_stats
+        print(f"{requests} requests against a quota of {quota} calls/s in {elapsed:.2f} s")
+        print(f"  responses:  {dict(statuses)}")
+        print(f"  upstream:   {server.counters}")
+        print(f"  scheduler:  {schedulers_stats()}")
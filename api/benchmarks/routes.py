@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Annotated, Callable, Dict, List, Tuple
+import numpy as np
+from api.benchmarks.fixtures import FIXTURES_DIR, FaultInjector, FixtureStore, ReplayServer, replay_yfinance_utils, seed_synthetic
+
+## Load benchmark of every /api/py route against replayed upstream fixtures. Requests are
+## driven straight through the ASGI app (middleware, routing, validation, serialization and
+## streamed bodies included, the HTTP server excluded), at several concurrency levels:
+##
+##   cold: every request asks for a new symbol, so it goes through to the (replayed) upstream
+##   warm: every request asks for the same symbol, so it is answered from the response cache
+##
+## For each route and level it reports throughput, p50/p99 latency and errors, plus the
+## Python heap allocated per request (tracemalloc peak, measured sequentially on its own).
+API_KEY = "benchmark-key"
+SEC_API_KEY = "benchmark-sec-key"
+REPORT_URL = "https://www.sec.gov/Archives/edgar/data/0000000/fake-10k.htm"
+ADMIN_TOKEN = "benchmark-admin-token"
+HEADERS = {"x-finnhub-api-key": API_KEY, "x-sec-api-key": SEC_API_KEY, "x-admin-token": ADMIN_TOKEN}
+
+# route -> (method, query builder for the i-th request's symbol or report URL)
+ROUTES: Dict[str, Tuple[str, Callable[[str, str], str]]] = {
+    "/api/py/get_income_statement": ("GET", lambda symbol, url: f"symbol={symbol}"),
+    "/api/py/get_income_statement?format=columnar": ("GET", lambda symbol, url: f"symbol={symbol}&format=columnar"),
+    "/api/py/get_company_profile": ("GET", lambda symbol, url: f"symbol={symbol}"),
+    "/api/py/get_company_news": ("GET", lambda symbol, url: f"symbol={symbol}"),
+    "/api/py/get_company_news_feed": ("GET", lambda symbol, url: f"symbol={symbol}"),
+    "/api/py/stream_company_news": ("GET", lambda symbol, url: f"symbol={symbol}"),
+    "/api/py/get_basic_financials": ("GET", lambda symbol, url: f"symbol={symbol}&selected_columns=metric1,series1"),
+    "/api/py/get_basic_financials_history": ("GET", lambda symbol, url: f"symbols={symbol}&start_date=2000-01-01&end_date=2024-12-31"),
+    "/api/py/get_sec_filing": ("GET", lambda symbol, url: f"symbol={symbol}"),
+    "/api/py/get_10k_section": ("GET", lambda symbol, url: f"html_report_url={url}&section=7"),
+    "/api/py/get_10k_section?stream=true": ("GET", lambda symbol, url: f"html_report_url={url}&section=7&stream=true"),
+    "/api/py/get_10k_section_chunk": ("GET", lambda symbol, url: f"html_report_url={url}&section=7&chunk=1"),
+    "/api/py/prefetch_10k_sections": ("POST", lambda symbol, url: f"symbol={symbol}"),
+    "/api/py/invalidate_10k_section": ("POST", lambda symbol, url: f"html_report_url={url}&section=7"),
+    "/api/py/snapshot": ("GET", lambda symbol, url: f"symbols={symbol}"),
+    "/api/py/stats": ("GET", lambda symbol, url: ""),
+    "/api/py/slow_requests": ("GET", lambda symbol, url: ""),
+}
+
+async def asgi_request(app, method: str, path: str, query: str) -> Tuple[int, int]:
+    """Send one request through the ASGI app and return (status, body bytes) once the body is complete."""
+    done = asyncio.Event()
+    sent = {"status": 0, "size": 0}
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming responses listen for a disconnect; only report one after the response is over
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            sent["size"] += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(name.encode(), value.encode()) for name, value in HEADERS.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    await app(scope, receive, send)
+    done.set()
+    return sent["status"], sent["size"]
+
+def reset_caches(section_dir: Annotated[str, "empty directory for this level's section store"]) -> None:
+    """Start a level with every cache empty, so cold requests really go upstream."""
+    from api.services import sections
+    from api.services.cache import response_cache
+    from api.services.news import news_ingestor
+    from api.utils.cache import MemoryBackend
+    from api.utils.section_store import SectionStore
+    response_cache.backend = MemoryBackend(response_cache.backend.max_entries)
+    sections.section_store = sections.section_cache.backend = SectionStore(section_dir)
+    news_ingestor.clear()
+
+def request_args(route: str, index: int, mode: str, run: int) -> Tuple[str, str, str]:
+    method, query = ROUTES[route]
+    # Cold requests never repeat a symbol or report URL, not even across runs
+    suffix = f"{run}X{index}" if mode == "cold" else "0"
+    return method, route.partition("?")[0], query(f"SYM{suffix}", f"{REPORT_URL}?copy={suffix}")
+
+async def run_level(app, route: str, mode: str, concurrency: int, requests: int, run: int) -> dict:
+    if mode == "warm":
+        # Fill the caches first so the measured requests only see hits
+        method, path, query = request_args(route, 0, mode, run)
+        await asgi_request(app, method, path, query)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = np.zeros(requests)
+    statuses = []
+
+    async def one(index: int):
+        method, path, query = request_args(route, index, mode, run)
+        async with semaphore:
+            start = time.perf_counter()
+            status, _ = await asgi_request(app, method, path, query)
+            latencies[index] = time.perf_counter() - start
+            statuses.append(status)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "route": route,
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput": requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "errors": sum(1 for status in statuses if status >= 400),
+    }
+
+async def memory_per_request(app, route: str, mode: str, samples: int, run: int) -> float:
+    """Mean tracemalloc peak of one request in KiB, requests run one at a time."""
+    peaks = []
+    if mode == "warm":
+        method, path, query = request_args(route, 0, mode, run)
+        await asgi_request(app, method, path, query)
+    tracemalloc.start()
+    try:
+        for index in range(samples):
+            method, path, query = request_args(route, index, mode, run)
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            await asgi_request(app, method, path, query)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return float(np.mean(peaks)) / 1024
+
+async def main(routes: List[str], modes: List[str], levels: List[int], requests: int, memory_samples: int, section_dir: str) -> List[dict]:
+    # Only import the app once `configure` pointed it at the replayed upstreams
+    from api.main import app
+    results = []
+    run = 0
+    for route in routes:
+        for mode in modes:
+            for concurrency in levels:
+                run += 1
+                reset_caches(os.path.join(section_dir, str(run)))
+                result = await run_level(app, route, mode, concurrency, requests, run)
+                run += 1
+                reset_caches(os.path.join(section_dir, str(run)))
+                result["memory_kib"] = await memory_per_request(app, route, mode, memory_samples, run)
+                results.append(result)
+                print(
+                    f"{route:<48} {mode:<4} c={concurrency:<3} {result['throughput']:9.1f} req/s "
+                    f"p50 {result['p50_ms']:8.2f} ms p99 {result['p99_ms']:8.2f} ms "
+                    f"{result['memory_kib']:9.1f} KiB/req errors {result['errors']}",
+                    flush=True,
+                )
+    return results
+
+def configure(store: FixtureStore, faults: FaultInjector, server: ReplayServer, section_dir: str) -> None:
+    """Point the app at the replayed upstreams; must run before api.main is imported."""
+    os.environ["FINNHUB_API_URL"] = server.api_url
+    os.environ["SEC_API_EXTRACTOR_URL"] = server.sec_api_url
+    os.environ["SECTION_STORE_DIR"] = section_dir
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+    # Measure the app, not the free-plan quota
+    os.environ.setdefault("FINNHUB_CALLS_PER_MINUTE", "1000000000")
+    os.environ.setdefault("FINNHUB_BURST", "1000000000")
+    from api.services.clients import yfinance_clients
+    yfinance_clients.factory = replay_yfinance_utils(store, faults)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m api.benchmarks.routes", description="Benchmark every /api/py route against replayed upstream fixtures.")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="fixtures directory, synthetic fixtures are used when it is empty")
+    parser.add_argument("--routes", nargs="*", default=list(ROUTES), help="routes to run, default all")
+    parser.add_argument("--modes", nargs="*", default=["cold", "warm"], choices=["cold", "warm"])
+    parser.add_argument("--concurrency", nargs="*", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route, mode and concurrency level")
+    parser.add_argument("--memory-samples", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02, help="upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    unknown = [route for route in args.routes if route not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes {unknown}, choose from {list(ROUTES)}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        store = FixtureStore(args.fixtures)
+        if not len(store):
+            print(f"No fixtures in {args.fixtures}, using synthetic ones (record real ones with `python -m api.benchmarks.fixtures record`)")
+            store = FixtureStore(str(Path(scratch) / "fixtures"))
+            seed_synthetic(store)
+
+        faults = FaultInjector(args.latency, args.jitter, args.error_rate, seed=args.seed)
+        with ReplayServer(store, faults) as server:
+            section_dir = str(Path(scratch) / "sections")
+            configure(store, faults, server, section_dir)
+            print(f"{args.requests} requests per level, upstream latency {args.latency * 1000:.0f} ms, error rate {args.error_rate:.0%}")
+            results = asyncio.run(main(args.routes, args.modes, args.concurrency, args.requests, args.memory_samples, section_dir))
+            print(f"Replay server: {faults.counters}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+## Cold start cost of the API. Every run imports api.main in a fresh interpreter with
+## -X importtime and reports:
+##   - the wall time of `import api.main`
+##   - the cumulative import time of every api.* module and of the heaviest packages it pulls in
+##   - the cost of each deferred (lazy_import) module, paid by the first request that needs it
+## It also starts the server in a fresh interpreter and times its first answered request,
+## with the deferred modules preloaded at startup and without, since import time alone
+## misses what the startup hooks cost a cold start.
+MARKER = "--- api.main imported ---"
+CHILD = """
+import sys, json, time
+start = time.perf_counter()
+import api.main
+imported = time.perf_counter() - start
+print(%r, file=sys.stderr, flush=True)
+from api.utils.lazy import lazy_modules
+deferred = {}
+# Loading a module can register more deferred modules
+while any(not module.loaded for module in lazy_modules.values()):
+    for name, module in list(lazy_modules.items()):
+        if not module.loaded:
+            module.load()
+            deferred[name] = module.import_seconds
+print(json.dumps({"import_seconds": imported, "deferred": deferred}))
+""" % MARKER
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, float, float]]:
+    """(module, nesting depth, self seconds, cumulative seconds) for every line of -X importtime output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return modules
+
+def run_once(root: Path) -> dict:
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD], cwd=root, capture_output=True, text=True, check=True)
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    # Only what was imported before the deferred modules were loaded counts as startup
+    modules = parse_importtime(process.stderr.split(MARKER)[0])
+    result["api_modules"] = {name: cumulative for name, _, _, cumulative in modules if name == "api" or name.startswith("api.")}
+    # Third-party cost by top-level package, counted where the package is first imported
+    packages: Dict[str, float] = {}
+    for name, _, _, cumulative in modules:
+        package = name.split(".")[0]
+        if package != "api" and "." not in name:
+            packages[package] = packages.get(package, 0.0) + cumulative
+    result["packages"] = packages
+    return result
+
+# Answered without any upstream call or deferred module
+FIRST_RESPONSE_PATH = "/api/py/slow_requests"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_first_response(root: Path, preload: bool, timeout: float = 60.0) -> float:
+    """Seconds from starting the server process to its first successful response."""
+    port = free_port()
+    env = dict(os.environ, PRELOAD_MODULES="1" if preload else "0", WARMUP_SYMBOLS="")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{FIRST_RESPONSE_PATH}", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"The server did not answer within {timeout} s.")
+    finally:
+        process.terminate()
+        process.wait()
+
+def median_by_key(runs: List[dict], field: str) -> Dict[str, float]:
+    keys = {key for run in runs for key in run[field]}
+    return {key: statistics.median(run[field].get(key, 0.0) for run in runs) for key in keys}
+
+def main(runs: int, top: int) -> dict:
+    root = Path(__file__).resolve().parents[2]
+    results = [run_once(root) for _ in range(runs)]
+    summary = {
+        "runs": runs,
+        "import_api_main_ms": statistics.median(run["import_seconds"] for run in results) * 1000,
+        "api_modules_ms": {name: seconds * 1000 for name, seconds in median_by_key(results, "api_modules").items()},
+        "packages_ms": {name: seconds * 1000 for name, seconds in median_by_key(results, "packages").items()},
+        "deferred_ms": {name: seconds * 1000 for name, seconds in median_by_key(results, "deferred").items()},
+        "first_response_ms": {
+            mode: statistics.median(time_to_first_response(root, preload) for _ in range(runs)) * 1000
+            for mode, preload in (("preload", True), ("lazy", False))
+        },
+    }
+
+    print(f"import api.main: {summary['import_api_main_ms']:.0f} ms (median of {runs} fresh interpreters)")
+    print("\napi modules, cumulative:")
+    for name, ms in sorted(summary["api_modules_ms"].items(), key=lambda item: -item[1])[:top]:
+        print(f"  {name:<40} {ms:8.1f} ms")
+    print("\nheaviest packages imported at startup:")
+    for name, ms in sorted(summary["packages_ms"].items(), key=lambda item: -item[1])[:top]:
+        print(f"  {name:<40} {ms:8.1f} ms")
+    print("\ndeferred until first use:")
+    for name, ms in sorted(summary["deferred_ms"].items(), key=lambda item: -item[1]):
+        print(f"  {name:<40} {ms:8.1f} ms")
+    print("\nserver start to first response:")
+    for mode, ms in summary["first_response_ms"].items():
+        print(f"  {mode:<40} {ms:8.1f} ms")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m api.benchmarks.startup", description="Measure the import cost of api.main and of its deferred modules, and the server's time to first response.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="modules listed per section")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    summary = main(args.runs, args.top)
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2))
@@ -1,13 +1,58 @@
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Query, BackgroundTasks
 from pydantic import BaseModel
-from typing import List, Optional
-import json
-from api.services.yfinance import YFinanceUtils
-from api.services.finnhub import FinnhubUtils
+from typing import Any, Dict, List, Literal, Optional, Union
+import hmac
+import orjson
+import asyncio
+from datetime import datetime
+from api.services.clients import get_finnhub_utils, get_yfinance_utils, clients_stats, schedulers_stats, finnhub_clients, yfinance_clients, finnhub_service
+from api.utils.ratelimit import RateLimitExceeded
+from api.utils.index import today, to_columnar
+from api.utils.lazy import lazy_import, lazy_import_stats, preload
+from api.services.upstream import shutdown_executors
+from api.services.cache import DAY, MINUTE, cached_upstream, response_cache
+from api.services.news import news_ingestor, read_news
+from api.services.warmup import RefreshJob, WarmupScheduler, claim_warmup_leadership, warmup_symbols
+from api.services.sections import get_10k_section as fetch_10k_section, get_10k_section_chunks, read_10k_section_chunk, stream_10k_section_chunks, invalidate_10k_section as drop_10k_section, missing_sections, prefetch_10k_sections, section_cache
+from api.services.secapi import SectionUnavailable
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from api.services.metrics import MetricsMiddleware, multiprocess_registry, record_error, slow_requests
+from api.utils.metrics import CONTENT_TYPE, Gauge, registry, span
 import os 
 
-app = FastAPI()
+class ORJSONNumpyResponse(ORJSONResponse):
+    """orjson response that can also encode NumPy arrays returned as-is by a handler."""
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+# orjson is several times faster than the standard encoder and writes NaN as null instead of invalid JSON
+app = FastAPI(default_response_class=ORJSONNumpyResponse)
+
+preload_task: Optional[asyncio.Future] = None
+
+def preload_done(task: asyncio.Future) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Preloading services failed: {task.exception()}")
+
+@app.on_event("startup")
+async def preload_services():
+    # Import the deferred service modules in a thread while the server already answers, so a
+    # cold start is not delayed and later requests do not import them on the event loop; a request
+    # arriving first still loads what it needs through lazy_import. PRELOAD_MODULES=0 opts out
+    global preload_task
+    if os.getenv("PRELOAD_MODULES", "1") == "1":
+        preload_task = asyncio.ensure_future(asyncio.to_thread(preload))
+        preload_task.add_done_callback(preload_done)
+
+@app.on_event("shutdown")
+def shutdown_upstream():
+    shutdown_executors()
+    finnhub_clients.clear()
+    yfinance_clients.clear()
+
 origins = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",   
@@ -26,22 +71,72 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+async def fetch_income_statement(symbol: str, refresh: bool = False) -> dict:
+    # yfinance tickers are case-insensitive, so "aapl" shares the entry warmed for "AAPL"
+    symbol = symbol.upper()
+    yfin = get_yfinance_utils(symbol)
+    return await cached_upstream("income_statement", (symbol,), "yfinance", yfin.get_income_stmt, refresh=refresh)
+
+finnhub_exceptions = lazy_import("finnhub.exceptions")
+
+def to_http_exception(e: Exception) -> HTTPException:
+    """Map upstream failures to an HTTP error, telling clients when to retry if we are over quota."""
+    record_error(e)
+    if isinstance(e, RateLimitExceeded):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    if isinstance(e, SectionUnavailable):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    # A FinnhubAPIException can only have been raised if finnhub was imported
+    if finnhub_exceptions.loaded and isinstance(e, finnhub_exceptions.FinnhubAPIException) and e.status_code == 429:
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": e.response.headers.get("Retry-After", "60")})
+    return HTTPException(status_code=500, detail=str(e))
+
+async def fetch_income_statement_columnar(symbol: str) -> dict:
+    symbol = symbol.upper()
+    yfin = get_yfinance_utils(symbol)
+    return await cached_upstream("income_statement_columnar", (symbol,), "yfinance", yfin.get_income_stmt_columnar)
+
+class ColumnarIncomeStatement(BaseModel):
+    periods: List[str]
+    items: Dict[str, List[Optional[float]]]
+
 class IncomeStatementResponse(BaseModel):
     symbol: str
-    income_statement: dict
+    income_statement: Union[ColumnarIncomeStatement, dict]
 
 @app.get("/api/py/get_income_statement", response_model=IncomeStatementResponse)
-async def get_income_statement(symbol: str):
-    """Retrieve and format a detailed income statement of a company using its stock ticker symbol."""
+async def get_income_statement(symbol: str, format: Literal["records", "columnar"] = "records"):
+    """Retrieve and format a detailed income statement of a company using its stock ticker symbol.
+
+    `records` returns one {line item: value} dict per period; `columnar` returns a periods array and one value array per line item.
+    """
     if not symbol:
         raise HTTPException(status_code=400, detail="Symbol parameter is required.")
 
-    yfin = YFinanceUtils(symbol)
     try:
-        income_stmt = yfin.get_income_stmt()
+        if format == "columnar":
+            income_stmt = await fetch_income_statement_columnar(symbol)
+            # Encode the NumPy buffers directly, skipping response model validation
+            return ORJSONNumpyResponse({"symbol": symbol, "income_statement": income_stmt})
+        income_stmt = await fetch_income_statement(symbol)
         return {"symbol": symbol, "income_statement": income_stmt}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
+
+async def fetch_company_profile_data(symbol: str, api_key: str, refresh: bool = False) -> dict:
+    finnhub_utils = get_finnhub_utils(api_key)
+    return await cached_upstream("company_profile", (symbol,), "finnhub", finnhub_utils.get_company_profile_data, symbol, refresh=refresh, scheduler=finnhub_utils.scheduler)
+
+async def fetch_quote(symbol: str, api_key: str, refresh: bool = False) -> dict:
+    finnhub_utils = get_finnhub_utils(api_key)
+    return await cached_upstream("quote", (symbol,), "finnhub", finnhub_utils.get_quote, symbol, refresh=refresh, scheduler=finnhub_utils.scheduler)
+
+async def fetch_company_profile(symbol: str, api_key: str) -> str:
+    # The profile and the quote are independent upstream calls, so fetch them in parallel
+    profile_data, quote = await asyncio.gather(fetch_company_profile_data(symbol, api_key), fetch_quote(symbol, api_key))
+    with span("FinnhubUtils.format_company_profile"):
+        return finnhub_service.FinnhubUtils.format_company_profile(symbol, profile_data, quote)
 
 class CompanyProfileResponse(BaseModel):
     symbol: str
@@ -54,14 +149,20 @@ async def get_company_profile(symbol: str, x_finnhub_api_key: str = Header(...))
         raise HTTPException(status_code=400, detail="Symbol parameter is required.")
     
     try:
-        finnhub_utils = FinnhubUtils(x_finnhub_api_key)
-        profile = finnhub_utils.get_company_profile(symbol)
+        profile = await fetch_company_profile(symbol, x_finnhub_api_key)
         return {
             "symbol": symbol,
             "company_profile": profile
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
+
+async def fetch_company_news(symbol: str, api_key: str, start_date: Optional[str] = None, end_date: Optional[str] = None, max_news_num: int = 10) -> List[dict]:
+    finnhub_utils = get_finnhub_utils(api_key)
+    # Resolve the default window per request, so the cache key names the days it covers
+    start_date = start_date or today(1)
+    end_date = end_date or today()
+    return await cached_upstream("company_news", (symbol, start_date, end_date, max_news_num), "finnhub", finnhub_utils.get_company_news, symbol, start_date, end_date, max_news_num, scheduler=finnhub_utils.scheduler)
 
 class CompanyNewsResponse(BaseModel):
     symbol: str
@@ -74,28 +175,150 @@ async def get_company_news(symbol: str, x_finnhub_api_key: str = Header(...), st
         raise HTTPException(status_code=400, detail="Symbol parameter is required.")
     
     try:
-        finnhub_utils = FinnhubUtils(x_finnhub_api_key)
-        news = finnhub_utils.get_company_news(symbol, start_date, end_date, max_news_num)
+        news = await fetch_company_news(symbol, x_finnhub_api_key, start_date, end_date, max_news_num)
         return {"symbol": symbol, "news": news}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
+
+def split_symbols(symbols: List[str]) -> List[str]:
+    """Accept both ?symbols=A&symbols=B and ?symbols=A,B, dropping duplicates."""
+    return list(dict.fromkeys(symbol.strip() for raw in symbols for symbol in raw.split(",") if symbol.strip()))
+
+def split_columns(selected_columns: Optional[List[str]]) -> Optional[List[str]]:
+    """Accept both ?selected_columns=a&selected_columns=b and ?selected_columns=a,b"""
+    if not selected_columns:
+        return None
+    return [column.strip() for raw in selected_columns for column in raw.split(",") if column.strip()]
+
+async def fetch_basic_financials(symbol: str, api_key: str, selected_columns: Optional[List[str]] = None, refresh: bool = False) -> dict:
+    finnhub_utils = get_finnhub_utils(api_key)
+    # Cache one index of latest values per symbol and filter it per request, so any column selection is a cache hit
+    index = await cached_upstream("basic_financials", (symbol,), "finnhub", finnhub_utils.get_basic_financials_index, symbol, refresh=refresh, scheduler=finnhub_utils.scheduler)
+    return finnhub_service.FinnhubUtils.select_metrics(index, split_columns(selected_columns))
+
+async def ingest_company_news(symbol: str, api_key: str) -> int:
+    finnhub_utils = get_finnhub_utils(api_key)
+    # Keyed by the store the articles go to: a process keeping news in memory never skips an ingestion done by another one
+    return await cached_upstream("news_ingest", (symbol, news_ingestor.store.name), "finnhub", news_ingestor.ingest, finnhub_utils, symbol, scheduler=finnhub_utils.scheduler)
+
+class CompanyNewsFeedResponse(BaseModel):
+    symbol: str
+    news: List[dict]
+    next_cursor: Optional[str] = None
+
+@app.get("/api/py/get_company_news_feed", response_model=CompanyNewsFeedResponse)
+async def get_company_news_feed(symbol: str, x_finnhub_api_key: str = Header(...), limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    """Page through the latest deduplicated news articles of a company, newest first."""
+    if not symbol:
+        raise HTTPException(status_code=400, detail="Symbol parameter is required.")
+
+    try:
+        # Only the first page pulls new articles, so later pages stay consistent with it
+        if cursor is None:
+            await ingest_company_news(symbol, x_finnhub_api_key)
+        news, next_cursor = await read_news(news_ingestor.page, symbol, limit, cursor)
+        return {"symbol": symbol, "news": news, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise to_http_exception(e)
+
+@app.get("/api/py/stream_company_news")
+async def stream_company_news(symbol: str, x_finnhub_api_key: str = Header(...), limit: int = Query(20, ge=1, le=100)):
+    """Stream the latest news articles of a company as NDJSON: already known articles first, then newly fetched ones."""
+    if not symbol:
+        raise HTTPException(status_code=400, detail="Symbol parameter is required.")
+
+    def ndjson(payload: dict) -> bytes:
+        return orjson.dumps(payload) + b"\n"
+
+    async def stream_news():
+        sent = set()
+        for article in await read_news(news_ingestor.latest, symbol, limit):
+            sent.add(article["id"])
+            yield ndjson(article)
+        try:
+            await ingest_company_news(symbol, x_finnhub_api_key)
+        except Exception as e:
+            yield ndjson({"error": str(e)})
+            return
+        for article in await read_news(news_ingestor.latest, symbol, limit):
+            if article["id"] not in sent:
+                yield ndjson(article)
+
+    return StreamingResponse(stream_news(), media_type="application/x-ndjson")
 
 class BasicFinancialsResponse(BaseModel):
     symbol: str
     financials: dict
 
 @app.get("/api/py/get_basic_financials", response_model=BasicFinancialsResponse)
-async def get_basic_financials(symbol: str, x_finnhub_api_key: str = Header(...), selected_columns: Optional[List[str]] = None):
+async def get_basic_financials(symbol: str, x_finnhub_api_key: str = Header(...), selected_columns: Optional[List[str]] = Query(None)):
     """Get the most recent basic financial data for a company using its stock ticker symbol, with optional specific financial metrics."""
     if not symbol:
         raise HTTPException(status_code=400, detail="Symbol parameter is required.")
     
     try:
-        finnhub_utils = FinnhubUtils(x_finnhub_api_key)
-        financials = finnhub_utils.get_basic_financials(symbol, selected_columns)
-        return {"symbol": symbol, "financials": json.loads(financials)}
+        financials = await fetch_basic_financials(symbol, x_finnhub_api_key, selected_columns)
+        return {"symbol": symbol, "financials": financials}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
+
+async def fetch_sec_filing(symbol: str, api_key: str, form: Optional[str] = "10-K", from_date: Optional[str] = None, to_date: Optional[str] = None, refresh: bool = False) -> dict:
+    finnhub_utils = get_finnhub_utils(api_key)
+    # The default window (the last 12 months) stays None in the key and is resolved by get_sec_filing,
+    # so the entry refreshed by the warmup is the one every request of the week reads
+    return await cached_upstream("sec_filing", (symbol, form, from_date, to_date), "finnhub", finnhub_utils.get_sec_filing, symbol, form, from_date, to_date, refresh=refresh, scheduler=finnhub_utils.scheduler)
+
+HISTORY_MAX_SYMBOLS = 50
+HISTORY_MAX_CONCURRENCY = int(os.getenv("HISTORY_MAX_CONCURRENCY", 8))
+
+def validate_date(name: str, value: str) -> str:
+    """Reject a malformed yyyy-mm-dd parameter with a 400, before a streamed response has started."""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} {value}. Please specify a date as yyyy-mm-dd.")
+    return value
+
+async def fetch_basic_financials_history(symbol: str, api_key: str, freq: str, start_date: str, end_date: str, selected_columns: Optional[List[str]] = None) -> dict:
+    finnhub_utils = get_finnhub_utils(api_key)
+    # Cache the full frame per (symbol, freq) and cut it per request
+    frame = await cached_upstream("basic_financials_history", (symbol, freq), "finnhub", finnhub_utils.get_basic_financials_series, symbol, freq, scheduler=finnhub_utils.scheduler)
+    return to_columnar(finnhub_service.FinnhubUtils.slice_history(frame, start_date, end_date, selected_columns))
+
+@app.get("/api/py/get_basic_financials_history")
+async def get_basic_financials_history(symbols: List[str] = Query(...), x_finnhub_api_key: str = Header(...), freq: str = "annual", start_date: Optional[str] = None, end_date: Optional[str] = None, selected_columns: Optional[List[str]] = Query(None)):
+    """Retrieve historical financial data for one or many companies, streamed as one compact columnar JSON line per symbol."""
+    symbols = split_symbols(symbols)
+    if not symbols:
+        raise HTTPException(status_code=400, detail="Symbols parameter is required.")
+    if len(symbols) > HISTORY_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {HISTORY_MAX_SYMBOLS} symbols can be requested at once.")
+    if freq not in ["annual", "quarterly"]:
+        raise HTTPException(status_code=400, detail=f"Invalid reporting frequency {freq}. Please specify either 'annual' or 'quarterly'.")
+
+    start_date = validate_date("start_date", start_date or today(12 * 30))
+    end_date = validate_date("end_date", end_date or today())
+    selected_columns = split_columns(selected_columns)
+    semaphore = asyncio.Semaphore(HISTORY_MAX_CONCURRENCY)
+
+    async def history_line(symbol: str) -> bytes:
+        async with semaphore:
+            try:
+                history = await fetch_basic_financials_history(symbol, x_finnhub_api_key, freq, start_date, end_date, selected_columns)
+                line = {"symbol": symbol, "freq": freq, **history}
+            except Exception as e:
+                record_error(e)
+                line = {"symbol": symbol, "freq": freq, "error": str(e)}
+        return orjson.dumps(line) + b"\n"
+
+    async def stream_histories():
+        # Emit each symbol as soon as it is ready instead of waiting for the slowest one
+        for line in asyncio.as_completed([history_line(symbol) for symbol in symbols]):
+            yield await line
+
+    return StreamingResponse(stream_histories(), media_type="application/x-ndjson")
 
 class SecFilingResponse(BaseModel):
     symbol: str
@@ -108,11 +331,241 @@ async def get_sec_filing(symbol: str, x_finnhub_api_key: str = Header(...), form
         raise HTTPException(status_code=400, detail="Symbol parameter is required.")
     
     try:
-        finnhub_utils = FinnhubUtils(x_finnhub_api_key)
-        filing = finnhub_utils.get_sec_filing(symbol, form, from_date, to_date)
+        filing = await fetch_sec_filing(symbol, x_finnhub_api_key, form, from_date, to_date)
         return {"symbol": symbol, "filing": filing}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
+
+class SecSectionResponse(BaseModel):
+    html_report_url: str
+    section: str
+    section_text: str
+
+SECTION_CHUNK_TOKENS = 1000
+
+@app.get("/api/py/get_10k_section", response_model=SecSectionResponse)
+async def get_10k_section(html_report_url: str, section: str, x_sec_api_key: str = Header(...), stream: bool = False, chunk_tokens: int = Query(SECTION_CHUNK_TOKENS, ge=100, le=32000)):
+    """Get a specific section of a 10-K report from the SEC API, extracted once and then served from disk.
+
+    With `stream=true` the section is streamed as NDJSON chunks of about `chunk_tokens` tokens each.
+    """
+    if not html_report_url:
+        raise HTTPException(status_code=400, detail="html_report_url parameter is required.")
+
+    try:
+        if stream:
+            key, spans = await get_10k_section_chunks(x_sec_api_key, html_report_url, section, chunk_tokens)
+        else:
+            section_text = await fetch_10k_section(x_sec_api_key, html_report_url, section)
+            return {"html_report_url": html_report_url, "section": section, "section_text": section_text}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise to_http_exception(e)
+
+    async def stream_chunks():
+        texts = stream_10k_section_chunks(key, spans)
+        try:
+            for chunk, (start, end) in enumerate(spans):
+                line = {"chunk": chunk, "total_chunks": len(spans), "start": start, "end": end, "text": await anext(texts)}
+                yield orjson.dumps(line) + b"\n"
+        finally:
+            await texts.aclose()
+
+    return StreamingResponse(stream_chunks(), media_type="application/x-ndjson")
+
+class SecSectionChunkResponse(BaseModel):
+    html_report_url: str
+    section: str
+    chunk: int
+    total_chunks: int
+    start: int
+    end: int
+    text: str
+
+@app.get("/api/py/get_10k_section_chunk", response_model=SecSectionChunkResponse)
+async def get_10k_section_chunk(html_report_url: str, section: str, chunk: int = Query(0, ge=0), x_sec_api_key: str = Header(...), chunk_tokens: int = Query(SECTION_CHUNK_TOKENS, ge=100, le=32000)):
+    """Get chunk `chunk` of a 10-K section, about `chunk_tokens` tokens cut at paragraph boundaries. `start` and `end` are UTF-8 byte offsets in the section."""
+    if not html_report_url:
+        raise HTTPException(status_code=400, detail="html_report_url parameter is required.")
+
+    try:
+        key, spans = await get_10k_section_chunks(x_sec_api_key, html_report_url, section, chunk_tokens)
+        if chunk >= len(spans):
+            raise HTTPException(status_code=404, detail=f"Section {section} only has {len(spans)} chunks.")
+        start, end = spans[chunk]
+        text = await read_10k_section_chunk(key, start, end)
+        return {"html_report_url": html_report_url, "section": section, "chunk": chunk, "total_chunks": len(spans), "start": start, "end": end, "text": text}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise to_http_exception(e)
+
+class InvalidateSectionResponse(BaseModel):
+    html_report_url: str
+    section: str
+    invalidated: bool
+
+def require_admin_token(token: Optional[str]) -> None:
+    """Let through only callers presenting ADMIN_TOKEN; every admin route is disabled while it is not set."""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled, set ADMIN_TOKEN to enable them.")
+    if token is None or not hmac.compare_digest(token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+@app.post("/api/py/invalidate_10k_section", response_model=InvalidateSectionResponse)
+async def invalidate_10k_section(html_report_url: str, section: str, x_admin_token: Optional[str] = Header(None)):
+    """Drop a stored 10-K section, e.g. a bad extraction or an amended filing, so the next request extracts it again."""
+    # Stored sections were paid for, so only an operator may make the next user pay for them again
+    require_admin_token(x_admin_token)
+    if not html_report_url:
+        raise HTTPException(status_code=400, detail="html_report_url parameter is required.")
+
+    try:
+        invalidated = await asyncio.to_thread(drop_10k_section, html_report_url, section)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"html_report_url": html_report_url, "section": section, "invalidated": invalidated}
+
+class PrefetchSectionsResponse(BaseModel):
+    symbol: str
+    html_report_url: str
+    scheduled_sections: List[str]
+
+@app.post("/api/py/prefetch_10k_sections", response_model=PrefetchSectionsResponse, status_code=202)
+async def prefetch_latest_10k_sections(symbol: str, background_tasks: BackgroundTasks, x_finnhub_api_key: str = Header(...), x_sec_api_key: str = Header(...)):
+    """Extract every section of the latest 10-K filing of a company in the background."""
+    if not symbol:
+        raise HTTPException(status_code=400, detail="Symbol parameter is required.")
+
+    try:
+        filing = await fetch_sec_filing(symbol, x_finnhub_api_key)
+    except Exception as e:
+        raise to_http_exception(e)
+    if not filing.get("reportUrl"):
+        raise HTTPException(status_code=404, detail=f"No 10-K filing found for symbol {symbol}.")
+
+    html_report_url = filing["reportUrl"]
+    sections = missing_sections(html_report_url)
+    if sections:
+        background_tasks.add_task(prefetch_10k_sections, x_sec_api_key, html_report_url, sections)
+    return {"symbol": symbol, "html_report_url": html_report_url, "scheduled_sections": sections}
+
+SNAPSHOT_MAX_CONCURRENCY = int(os.getenv("SNAPSHOT_MAX_CONCURRENCY", 16))
+SNAPSHOT_MAX_SYMBOLS = 20
+SNAPSHOT_SECTIONS = ["income_statement", "basic_financials", "company_profile", "company_news", "sec_filing"]
+
+class SnapshotSection(BaseModel):
+    data: Optional[Any] = None
+    error: Optional[str] = None
+
+class SnapshotResponse(BaseModel):
+    snapshots: Dict[str, Dict[str, SnapshotSection]]
+
+@app.get("/api/py/snapshot", response_model=SnapshotResponse)
+async def get_snapshot(symbols: List[str] = Query(...), x_finnhub_api_key: str = Header(...), selected_columns: Optional[List[str]] = Query(None)):
+    """Fetch the income statement, basic financials, profile, news and latest 10-K filing of one or many companies in a single call."""
+    symbols = split_symbols(symbols)
+    if not symbols:
+        raise HTTPException(status_code=400, detail="Symbols parameter is required.")
+    if len(symbols) > SNAPSHOT_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {SNAPSHOT_MAX_SYMBOLS} symbols can be requested at once.")
+
+    semaphore = asyncio.Semaphore(SNAPSHOT_MAX_CONCURRENCY)
+
+    def section_fetchers(symbol: str) -> dict:
+        return {
+            "income_statement": lambda: fetch_income_statement(symbol),
+            "basic_financials": lambda: fetch_basic_financials(symbol, x_finnhub_api_key, selected_columns),
+            "company_profile": lambda: fetch_company_profile(symbol, x_finnhub_api_key),
+            "company_news": lambda: fetch_company_news(symbol, x_finnhub_api_key),
+            "sec_filing": lambda: fetch_sec_filing(symbol, x_finnhub_api_key),
+        }
+
+    async def run_section(fetch) -> SnapshotSection:
+        async with semaphore:
+            try:
+                return SnapshotSection(data=await fetch())
+            except Exception as e:
+                record_error(e)
+                return SnapshotSection(error=str(e))
+
+    jobs = [(symbol, section, fetch) for symbol in symbols for section, fetch in section_fetchers(symbol).items()]
+    results = await asyncio.gather(*(run_section(fetch) for _, _, fetch in jobs))
+
+    snapshots: Dict[str, Dict[str, SnapshotSection]] = {symbol: {} for symbol in symbols}
+    for (symbol, section, _), result in zip(jobs, results):
+        snapshots[symbol][section] = result
+    return {"snapshots": snapshots}
+
+def stats_report() -> dict:
+    return {"clients": clients_stats(), "rate_limits": schedulers_stats(), "cache": response_cache.stats(), "sections": section_cache.stats(), "news": news_ingestor.stats(), "warmup": warmup_scheduler.stats(), "imports": lazy_import_stats()}
+
+@app.get("/api/py/stats")
+async def get_stats():
+    """Report counters of the upstream client registries, Finnhub rate limiters and the response cache."""
+    # Entry counts and quota ledgers are read from SQLite files when the workers share them
+    return await asyncio.to_thread(stats_report)
+
+def cache_hit_ratios() -> dict:
+    return {(cache.name,): cache.hit_ratio() for cache in (response_cache, section_cache)}
+
+CACHE_HIT_RATIO = Gauge("api_cache_hit_ratio", "Share of cache lookups served without an upstream call.", ("cache",), collect=cache_hit_ratios)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint."""
+    if multiprocess_registry is not None:
+        return Response(await asyncio.to_thread(multiprocess_registry.render), media_type=CONTENT_TYPE)
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+@app.on_event("startup")
+async def start_metrics_writer():
+    if multiprocess_registry is not None:
+        multiprocess_registry.start()
+
+@app.on_event("shutdown")
+async def stop_metrics_writer():
+    if multiprocess_registry is not None:
+        await multiprocess_registry.stop()
+
+@app.get("/api/py/slow_requests")
+async def get_slow_requests():
+    """Recent requests slower than SLOW_REQUEST_SECONDS with the time spent in each upstream call, formatting and serialization."""
+    return {"enabled": slow_requests.enabled, "threshold_seconds": slow_requests.threshold, "requests": slow_requests.recent()}
+
+def build_warmup_scheduler() -> WarmupScheduler:
+    """Warm and refresh the WARMUP_SYMBOLS universe; the Finnhub datasets need FINNHUB_API_KEY."""
+    api_key = os.getenv("FINNHUB_API_KEY")
+    jobs = [RefreshJob("income_statement", float(os.getenv("WARMUP_INCOME_STATEMENT_INTERVAL", DAY)), lambda symbol: fetch_income_statement(symbol, refresh=True))]
+    if api_key:
+        jobs += [
+            RefreshJob("quote", float(os.getenv("WARMUP_QUOTE_INTERVAL", MINUTE)), lambda symbol: fetch_quote(symbol, api_key, refresh=True)),
+            RefreshJob("company_profile", float(os.getenv("WARMUP_PROFILE_INTERVAL", DAY)), lambda symbol: fetch_company_profile_data(symbol, api_key, refresh=True)),
+            RefreshJob("basic_financials", float(os.getenv("WARMUP_FINANCIALS_INTERVAL", DAY)), lambda symbol: fetch_basic_financials(symbol, api_key, refresh=True)),
+            RefreshJob("sec_filing", float(os.getenv("WARMUP_FILINGS_INTERVAL", 7 * DAY)), lambda symbol: fetch_sec_filing(symbol, api_key, refresh=True)),
+        ]
+    return WarmupScheduler(
+        warmup_symbols(),
+        jobs,
+        calls_per_minute=float(os.getenv("WARMUP_CALLS_PER_MINUTE", 30)),
+        max_concurrency=int(os.getenv("WARMUP_MAX_CONCURRENCY", 4)),
+    )
+
+warmup_scheduler = build_warmup_scheduler()
+
+@app.on_event("startup")
+async def start_warmup():
+    # With several workers sharing the cache, one of them refreshes it for all
+    if claim_warmup_leadership(os.getenv("WARMUP_LOCK_PATH")):
+        warmup_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_warmup():
+    await warmup_scheduler.stop()
 
 if __name__ == "__main__":
     import uvicorn
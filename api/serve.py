@@ -0,0 +1,46 @@
+import os
+import argparse
+import uvicorn
+
+## Production entry point: N uvicorn worker processes behind one port. The workers share
+## state through files in a state directory, so adding workers adds throughput without
+## multiplying upstream calls or Finnhub quota:
+##   - responses are cached in one SQLite file, and a leased key is fetched by one worker only
+##   - Finnhub token buckets live in one SQLite ledger, so a key's quota is shared by all workers
+##   - extracted 10-K sections share one store directory
+##   - ingested news lives in one SQLite file, so a news cursor pages the same articles on every worker
+##   - one worker, elected with a file lock, runs the warmup scheduler
+##   - each worker writes its metrics to a file, and /metrics merges the files of every worker
+## Settings already present in the environment are left as they are.
+def shared_state_env(state_dir: str) -> dict:
+    return {
+        "CACHE_BACKEND": "sqlite",
+        "CACHE_SQLITE_PATH": os.path.join(state_dir, "cache.sqlite3"),
+        "RATE_LIMIT_BACKEND": "sqlite",
+        "RATE_LIMIT_SQLITE_PATH": os.path.join(state_dir, "quota.sqlite3"),
+        "NEWS_BACKEND": "sqlite",
+        "NEWS_SQLITE_PATH": os.path.join(state_dir, "news.sqlite3"),
+        "SECTION_STORE_DIR": os.path.join(state_dir, "sec_sections"),
+        "WARMUP_LOCK_PATH": os.path.join(state_dir, "warmup.lock"),
+        "METRICS_DIR": os.path.join(state_dir, "metrics"),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m api.serve", description="Run the API with several worker processes sharing one cache and one quota ledger.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--state-dir", default=os.getenv("API_STATE_DIR", ".api_state"), help="directory of the files shared by the workers")
+    args = parser.parse_args()
+
+    os.makedirs(args.state_dir, exist_ok=True)
+    # Workers are spawned with this environment, so they all open the same files
+    for name, value in shared_state_env(args.state_dir).items():
+        os.environ.setdefault(name, value)
+    # Counters of a previous run would otherwise be added to this one's
+    metrics_dir = os.environ["METRICS_DIR"]
+    if os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            os.remove(os.path.join(metrics_dir, name))
+
+    uvicorn.run("api.main:app", host=args.host, port=args.port, workers=args.workers, proxy_headers=True)
@@ -0,0 +1,61 @@
+import os
+from typing import Annotated, Any, Callable, Optional
+from api.services.upstream import run_upstream
+from api.utils.cache import CachePolicy, MemoryBackend, ResponseCache, SQLiteBackend
+from api.utils.ratelimit import BACKGROUND, INTERACTIVE, RequestScheduler
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+## Freshness per cached upstream method. Quotes and news go stale in minutes, profiles
+## rarely change, income statements change quarterly and 10-K filings a few times a year.
+POLICIES = {
+    "quote": CachePolicy(ttl=MINUTE, stale_ttl=MINUTE),
+    "company_news": CachePolicy(ttl=5 * MINUTE, stale_ttl=10 * MINUTE),
+    "company_profile": CachePolicy(ttl=DAY, stale_ttl=7 * DAY),
+    "basic_financials": CachePolicy(ttl=6 * HOUR, stale_ttl=DAY),
+    "basic_financials_history": CachePolicy(ttl=DAY, stale_ttl=7 * DAY),
+    "income_statement": CachePolicy(ttl=DAY, stale_ttl=30 * DAY),
+    "income_statement_columnar": CachePolicy(ttl=DAY, stale_ttl=30 * DAY),
+    "sec_filing": CachePolicy(ttl=DAY, stale_ttl=7 * DAY),
+    # Incremental news ingestion runs at most once a minute per symbol and news store
+    "news_ingest": CachePolicy(ttl=MINUTE),
+}
+
+def build_backend():
+    """Select the cache backend from CACHE_BACKEND ('memory' or 'sqlite')."""
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    if backend == "sqlite":
+        return SQLiteBackend(os.getenv("CACHE_SQLITE_PATH", "api_cache.sqlite3"), max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 50_000)))
+    if backend == "memory":
+        return MemoryBackend(int(os.getenv("CACHE_MAX_ENTRIES", 2048)))
+    raise ValueError(f"Invalid cache backend {backend}. Please specify either 'memory' or 'sqlite'.")
+
+response_cache = ResponseCache(build_backend(), POLICIES)
+
+# Quotes and profiles back interactive views, so they jump ahead of news and financials
+PRIORITIES = {
+    "quote": INTERACTIVE,
+    "company_profile": INTERACTIVE,
+}
+
+async def cached_upstream(
+    endpoint: Annotated[str, "cache policy name"],
+    key_parts: Annotated[tuple, "arguments that identify the response"],
+    provider: Annotated[str, "one of 'finnhub', 'yfinance', 'secapi'"],
+    func: Callable[..., Any],
+    *args,
+    refresh: Annotated[bool, "bypass the cached entry and store a fresh one"] = False,
+    scheduler: Annotated[Optional[RequestScheduler], "rate limiter of the API key the call is made with"] = None,
+    **kwargs,
+) -> Any:
+    """Serve an upstream call from the response cache, calling upstream only on a miss or refresh."""
+    # Background refreshes never hold up a user waiting for the same quota
+    priority = BACKGROUND if refresh else PRIORITIES.get(endpoint, BACKGROUND)
+    return await response_cache.get_or_fetch(
+        endpoint,
+        key_parts,
+        lambda: run_upstream(provider, func, *args, scheduler=scheduler, priority=priority, **kwargs),
+        refresh=refresh,
+    )
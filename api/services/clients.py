@@ -0,0 +1,85 @@
+import os
+from typing import TYPE_CHECKING
+from api.services.upstream import executors
+from api.utils.lazy import lazy_import
+from api.utils.ratelimit import LedgerBucket, MemoryLedger, RequestScheduler, SQLiteLedger
+from api.utils.registry import ClientRegistry
+
+if TYPE_CHECKING:
+    from api.services.finnhub import FinnhubUtils
+    from api.services.yfinance import YFinanceUtils
+    from api.services.secapi import SecApiUtils
+
+# Each service module pulls in its upstream SDK (and pandas), so it is only imported by the first request that needs it
+finnhub_service = lazy_import("api.services.finnhub")
+yfinance_service = lazy_import("api.services.yfinance")
+secapi_service = lazy_import("api.services.secapi")
+
+def build_ledger():
+    """Select the quota ledger from RATE_LIMIT_BACKEND: 'memory', or 'sqlite' to share quotas between worker processes."""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    if backend == "sqlite":
+        return SQLiteLedger(os.getenv("RATE_LIMIT_SQLITE_PATH", "api_quota.sqlite3"))
+    if backend == "memory":
+        return MemoryLedger()
+    raise ValueError(f"Invalid rate limit backend {backend}. Please specify either 'memory' or 'sqlite'.")
+
+quota_ledger = build_ledger()
+
+def build_finnhub_scheduler(api_key: str) -> RequestScheduler:
+    """Per-key Finnhub quota, defaults match the free plan (60 calls/minute, 30 calls/second burst)."""
+    rate = float(os.getenv("FINNHUB_CALLS_PER_MINUTE", 60)) / 60
+    burst = float(os.getenv("FINNHUB_BURST", 30))
+    return RequestScheduler(
+        rate=rate,
+        burst=burst,
+        max_queue=int(os.getenv("FINNHUB_MAX_QUEUE", 64)),
+        max_wait=float(os.getenv("FINNHUB_MAX_WAIT", 10)),
+        # The bucket lives in the ledger, so it outlives an evicted client and is shared with other workers
+        bucket=LedgerBucket(quota_ledger, f"finnhub:{api_key}", rate, burst),
+    )
+
+## Process-wide client registries. Finnhub clients are keyed by API key and keep their
+## connection pool alive between requests; yfinance tickers are keyed by symbol.
+finnhub_clients = ClientRegistry(
+    lambda api_key: finnhub_service.FinnhubUtils(api_key, pool_size=executors["finnhub"].max_concurrency, scheduler=build_finnhub_scheduler(api_key)),
+    max_size=int(os.getenv("FINNHUB_CLIENTS_MAX", 64)),
+    idle_ttl=float(os.getenv("FINNHUB_CLIENTS_IDLE_TTL", 900)),
+)
+
+# YFinanceUtils builds a new yf.Ticker per fetch, so how fresh its data is only depends on the response cache
+yfinance_clients = ClientRegistry(
+    lambda symbol: yfinance_service.YFinanceUtils(symbol),
+    max_size=int(os.getenv("YFINANCE_CLIENTS_MAX", 256)),
+    idle_ttl=float(os.getenv("YFINANCE_CLIENTS_IDLE_TTL", 3600)),
+)
+
+secapi_clients = ClientRegistry(
+    lambda api_key: secapi_service.SecApiUtils(api_key),
+    max_size=int(os.getenv("SECAPI_CLIENTS_MAX", 64)),
+    idle_ttl=float(os.getenv("SECAPI_CLIENTS_IDLE_TTL", 900)),
+)
+
+def get_finnhub_utils(api_key: str) -> "FinnhubUtils":
+    return finnhub_clients.get(api_key)
+
+def get_yfinance_utils(symbol: str) -> "YFinanceUtils":
+    return yfinance_clients.get(symbol.upper())
+
+def get_secapi_utils(api_key: str) -> "SecApiUtils":
+    return secapi_clients.get(api_key)
+
+def clients_stats() -> dict:
+    return {
+        "finnhub": finnhub_clients.stats(),
+        "yfinance": yfinance_clients.stats(),
+        "secapi": secapi_clients.stats(),
+    }
+
+def schedulers_stats() -> dict:
+    """Rate limiter counters per live Finnhub client, keyed by a masked API key."""
+    return {
+        f"...{api_key[-4:]}": client.scheduler.stats()
+        for api_key, client in finnhub_clients.items()
+        if client.scheduler is not None
+    }
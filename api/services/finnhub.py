@@ -1,28 +1,54 @@
 import os 
-import json
 from typing import Annotated
-import pandas as pd
 from datetime import datetime
-from collections import defaultdict
+import heapq
 import finnhub
 import sys
+from requests.adapters import HTTPAdapter
 from api.utils.index import today
+from api.utils.lazy import lazy_import
+from api.utils.ratelimit import RequestScheduler
 from typing import List, Optional
 
+# Only the financials history needs numpy and pandas, keep them off the profile, quote and news path
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
 ## FINNHUB API DOCUMENTATION: https://finnhub.io/docs/api
 class FinnhubUtils:
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        pool_size: Annotated[int, "max keep-alive connections to finnhub"] = 16,
+        scheduler: Annotated[Optional[RequestScheduler], "rate limiter shared by every call made with this key, awaited by callers before each call"] = None,
+    ):
         self.finnhub_client = finnhub.Client(api_key=api_key)
+        self.scheduler = scheduler
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.finnhub_client._session.mount("https://", adapter)
+        self.finnhub_client._session.mount("http://", adapter)
+        # Point the client at a different base URL, e.g. a local fake upstream for benchmarks
+        api_url = os.getenv("FINNHUB_API_URL")
+        if api_url:
+            self.finnhub_client.API_URL = api_url
 
-    def get_company_profile(self, symbol: Annotated[str, "ticker symbol"]) -> str:
-        """Retrieve and format a detailed profile of a company using its stock ticker symbol."""
-        
-        profile = self.finnhub_client.company_profile2(symbol=symbol)
-        
+    def close(self) -> None:
+        self.finnhub_client.close()
+
+    def get_company_profile_data(self, symbol: Annotated[str, "ticker symbol"]) -> dict:
+        """Retrieve the raw company profile of a stock ticker symbol."""
+        return self.finnhub_client.company_profile2(symbol=symbol)
+
+    def get_quote(self, symbol: Annotated[str, "ticker symbol"]) -> dict:
+        """Retrieve the latest quote of a stock ticker symbol."""
+        return self.finnhub_client.quote(symbol=symbol)
+
+    @staticmethod
+    def format_company_profile(symbol: Annotated[str, "ticker symbol"], profile: dict, quote: dict) -> str:
+        """Format a raw company profile and quote into a short description of the company."""
         if not profile:
             return f"\nFailed to find company profile for symbol {symbol} from finnhub!"
 
-        quote = self.finnhub_client.quote(symbol=symbol)
         if not quote:
             return f"\nFailed to fetch stock price for symbol {symbol} from finnhub!"
 
@@ -41,6 +67,14 @@ class FinnhubUtils:
         
         return formatted_str
 
+    def get_company_profile(self, symbol: Annotated[str, "ticker symbol"]) -> str:
+        """Retrieve and format a detailed profile of a company using its stock ticker symbol."""
+        
+        profile = self.get_company_profile_data(symbol)
+        quote = self.get_quote(symbol) if profile else {}
+
+        return self.format_company_profile(symbol, profile, quote)
+
     def get_company_news(
         self,
         symbol: Annotated[str, "ticker symbol"],
@@ -55,7 +89,7 @@ class FinnhubUtils:
         max_news_num: Annotated[
             int, "maximum number of news to return, default to 10"
             ] = 10,
-        ) -> pd.DataFrame:
+        ) -> List[dict]:
             """Fetch recent news articles about a company based on its stock ticker, within a specified date range."""
 
             # Use default date values if not provided
@@ -68,24 +102,25 @@ class FinnhubUtils:
             
             if len(news) == 0:
                 print(f"No company news found for symbol {symbol} from finnhub!")
-                
-            news = [
-                {
-                    "date": datetime.fromtimestamp(n["datetime"]).strftime("%Y%m%d%H%M%S"),
-                    "headline": n["headline"],
-                    "url": n["url"],
-                    "source": n["source"],
-                    "summary": n["summary"],
-                }
-                for n in news
-            ]
-            
-            # Select the 10 most recent news if the number of news exceeds the limit
-            if len(news) > max_news_num:
-                news = news[:max_news_num]
-            news.sort(key=lambda x: x["date"])
+
+            # Keep the most recent articles, then only format those, oldest first
+            latest_news = heapq.nlargest(max_news_num, news, key=lambda n: n["datetime"])
             
-            return news
+            return [self.format_news(n) for n in reversed(latest_news)]
+
+    def get_raw_company_news(self, symbol: Annotated[str, "ticker symbol"], start_date: str, end_date: str) -> List[dict]:
+        """Fetch unformatted news articles of a company, as returned by finnhub, within a date range."""
+        return self.finnhub_client.company_news(symbol, _from=start_date, to=end_date)
+
+    @staticmethod
+    def format_news(news: Annotated[dict, "raw finnhub news article"]) -> dict:
+        return {
+            "date": datetime.fromtimestamp(news["datetime"]).strftime("%Y%m%d%H%M%S"),
+            "headline": news["headline"],
+            "url": news["url"],
+            "source": news["source"],
+            "summary": news["summary"],
+        }
 
     def get_basic_financials_history(
         self,
@@ -95,42 +130,70 @@ class FinnhubUtils:
             "reporting frequency of the company's basic financials: annual / quarterly",
         ],
         start_date: Annotated[
-            str,
-            "start date of the search period for the company's basic financials, yyyy-mm-dd",
-        ] = today(12 * 30),
+            Optional[str],
+            "start date of the search period for the company's basic financials, yyyy-mm-dd, defaults to 30 years ago",
+        ] = None,
         end_date: Annotated[
-            str,
-            "end date of the search period for the company's basic financials, yyyy-mm-dd",
-        ] = today(),
+            Optional[str],
+            "end date of the search period for the company's basic financials, yyyy-mm-dd, defaults to today",
+        ] = None,
         selected_columns: Annotated[
             Optional[List[str]],
             "List of column names of news to return, should be chosen from 'assetTurnoverTTM', 'bookValue', 'cashRatio', 'currentRatio', 'ebitPerShare', 'eps', 'ev', 'fcfMargin', 'fcfPerShareTTM', 'grossMargin', 'inventoryTurnoverTTM', 'longtermDebtTotalAsset', 'longtermDebtTotalCapital', 'longtermDebtTotalEquity', 'netDebtToTotalCapital', 'netDebtToTotalEquity', 'netMargin', 'operatingMargin', 'payoutRatioTTM', 'pb', 'peTTM', 'pfcfTTM', 'pretaxMargin', 'psTTM', 'ptbv', 'quickRatio', 'receivablesTurnoverTTM', 'roaTTM', 'roeTTM', 'roicTTM', 'rotcTTM', 'salesPerShare', 'sgaToSale', 'tangibleBookValue', 'totalDebtToEquity', 'totalDebtToTotalAsset', 'totalDebtToTotalCapital', 'totalRatio'",
         ] = None,
-    ) -> pd.DataFrame:
+    ) -> "pd.DataFrame":
         """Retrieve historical financial data for a company, specified by stock ticker, for chosen financial metrics over time."""
-        
+
+        # Defaults are resolved per call, not once when the module is imported
+        start_date = start_date or today(12 * 30)
+        end_date = end_date or today()
+        frame = self.get_basic_financials_series(symbol, freq)
+        return self.slice_history(frame, start_date, end_date, selected_columns)
+
+    def get_basic_financials_series(
+        self,
+        symbol: Annotated[str, "ticker symbol"],
+        freq: Annotated[str, "reporting frequency of the company's basic financials: annual / quarterly"],
+    ) -> "pd.DataFrame":
+        """Retrieve every historical basic financial series of a company as one date-indexed frame, to be cut with `slice_history`."""
+
         if freq not in ["annual", "quarterly"]:
             raise ValueError(f"Invalid reporting frequency {freq}. Please specify either 'annual' or 'quarterly'.")
-        
-        columns = selected_columns if selected_columns else 'all'
-        
-        basic_financials = self.finnhub_client.company_basic_financials(symbol, columns)
-    
-        if not basic_financials["series"]:
-            raise ValueError(f"Failed to find basic financials for symbol {symbol} from finnhub! Try a different symbol.")
 
-        output_dict = defaultdict(dict)
-        for metric, value_list in basic_financials["series"].get(freq, {}).items():
-            if selected_columns and metric not in selected_columns:
-                continue
-            for value in value_list:
-                if start_date <= value["period"] <= end_date:
-                    output_dict[metric].update({value["period"]: value["v"]})
+        basic_financials = self._fetch_basic_financials(symbol)
+        return self.series_frame(basic_financials["series"].get(freq, {}))
 
-        financials_output = pd.DataFrame(output_dict)
-        financials_output = financials_output.rename_axis(index="date")
+    @staticmethod
+    def series_frame(series: Annotated[dict, "finnhub series of one frequency: {metric: [{period, v}, ...]}"]) -> "pd.DataFrame":
+        """Build a (date x metric) frame from finnhub series with flat NumPy arrays instead of per-value dict updates."""
+        metrics = list(series)
+        points = [point for metric in metrics for point in series[metric]]
+        lengths = np.fromiter((len(series[metric]) for metric in metrics), dtype=np.int64, count=len(metrics))
 
-        return financials_output
+        periods = np.array([point["period"] for point in points], dtype="datetime64[D]")
+        values = np.array([point["v"] for point in points], dtype=np.float64)
+        metric_codes = np.repeat(np.arange(len(metrics)), lengths)
+
+        dates, date_codes = np.unique(periods, return_inverse=True)
+        matrix = np.full((len(dates), len(metrics)), np.nan)
+        matrix[date_codes, metric_codes] = values
+
+        return pd.DataFrame(matrix, index=pd.DatetimeIndex(dates, name="date"), columns=metrics)
+
+    @staticmethod
+    def slice_history(
+        frame: "pd.DataFrame",
+        start_date: Annotated[str, "yyyy-mm-dd, inclusive"],
+        end_date: Annotated[str, "yyyy-mm-dd, inclusive"],
+        selected_columns: Optional[List[str]] = None,
+    ) -> "pd.DataFrame":
+        """Keep the rows within [start_date, end_date] and the selected metrics that have a value in that range."""
+        dates = frame.index.values
+        mask = (dates >= np.datetime64(start_date)) & (dates <= np.datetime64(end_date))
+        frame = frame[mask]
+        if selected_columns:
+            frame = frame[[column for column in selected_columns if column in frame.columns]]
+        return frame.dropna(axis=1, how="all").dropna(axis=0, how="all")
 
     def get_basic_financials(
             self,
@@ -139,34 +202,63 @@ class FinnhubUtils:
                 Optional[List[str]],
                 "List of column names of news to return, should be chosen from 'assetTurnoverTTM', 'bookValue', 'cashRatio', 'currentRatio', 'ebitPerShare', 'eps', 'ev', 'fcfMargin', 'fcfPerShareTTM', 'grossMargin', 'inventoryTurnoverTTM', 'longtermDebtTotalAsset', 'longtermDebtTotalCapital', 'longtermDebtTotalEquity', 'netDebtToTotalCapital', 'netDebtToTotalEquity', 'netMargin', 'operatingMargin', 'payoutRatioTTM', 'pb', 'peTTM', 'pfcfTTM', 'pretaxMargin', 'psTTM', 'ptbv', 'quickRatio', 'receivablesTurnoverTTM', 'roaTTM', 'roeTTM', 'roicTTM', 'rotcTTM', 'salesPerShare', 'sgaToSale', 'tangibleBookValue', 'totalDebtToEquity', 'totalDebtToTotalAsset', 'totalDebtToTotalCapital', 'totalRatio','10DayAverageTradingVolume', '13WeekPriceReturnDaily', '26WeekPriceReturnDaily', '3MonthADReturnStd', '3MonthAverageTradingVolume', '52WeekHigh', '52WeekHighDate', '52WeekLow', '52WeekLowDate', '52WeekPriceReturnDaily', '5DayPriceReturnDaily', 'assetTurnoverAnnual', 'assetTurnoverTTM', 'beta', 'bookValuePerShareAnnual', 'bookValuePerShareQuarterly', 'bookValueShareGrowth5Y', 'capexCagr5Y', 'cashFlowPerShareAnnual', 'cashFlowPerShareQuarterly', 'cashFlowPerShareTTM', 'cashPerSharePerShareAnnual', 'cashPerSharePerShareQuarterly', 'currentDividendYieldTTM', 'currentEv/freeCashFlowAnnual', 'currentEv/freeCashFlowTTM', 'currentRatioAnnual', 'currentRatioQuarterly', 'dividendGrowthRate5Y', 'dividendPerShareAnnual', 'dividendPerShareTTM', 'dividendYieldIndicatedAnnual', 'ebitdPerShareAnnual', 'ebitdPerShareTTM', 'ebitdaCagr5Y', 'ebitdaInterimCagr5Y', 'enterpriseValue', 'epsAnnual', 'epsBasicExclExtraItemsAnnual', 'epsBasicExclExtraItemsTTM', 'epsExclExtraItemsAnnual', 'epsExclExtraItemsTTM', 'epsGrowth3Y', 'epsGrowth5Y', 'epsGrowthQuarterlyYoy', 'epsGrowthTTMYoy', 'epsInclExtraItemsAnnual', 'epsInclExtraItemsTTM', 'epsNormalizedAnnual', 'epsTTM', 'focfCagr5Y', 'grossMargin5Y', 'grossMarginAnnual', 'grossMarginTTM', 'inventoryTurnoverAnnual', 'inventoryTurnoverTTM', 'longTermDebt/equityAnnual', 'longTermDebt/equityQuarterly', 'marketCapitalization', 'monthToDatePriceReturnDaily', 'netIncomeEmployeeAnnual', 'netIncomeEmployeeTTM', 'netInterestCoverageAnnual', 'netInterestCoverageTTM', 'netMarginGrowth5Y', 'netProfitMargin5Y', 'netProfitMarginAnnual', 'netProfitMarginTTM', 'operatingMargin5Y', 'operatingMarginAnnual', 'operatingMarginTTM', 'payoutRatioAnnual', 'payoutRatioTTM', 'pbAnnual', 'pbQuarterly', 'pcfShareAnnual', 'pcfShareTTM', 'peAnnual', 'peBasicExclExtraTTM', 'peExclExtraAnnual', 'peExclExtraTTM', 'peInclExtraTTM', 'peNormalizedAnnual', 'peTTM', 'pfcfShareAnnual', 'pfcfShareTTM', 'pretaxMargin5Y', 'pretaxMarginAnnual', 'pretaxMarginTTM', 'priceRelativeToS&P50013Week', 'priceRelativeToS&P50026Week', 'priceRelativeToS&P5004Week', 'priceRelativeToS&P50052Week', 'priceRelativeToS&P500Ytd', 'psAnnual', 'psTTM', 'ptbvAnnual', 'ptbvQuarterly', 'quickRatioAnnual', 'quickRatioQuarterly', 'receivablesTurnoverAnnual', 'receivablesTurnoverTTM', 'revenueEmployeeAnnual', 'revenueEmployeeTTM', 'revenueGrowth3Y', 'revenueGrowth5Y', 'revenueGrowthQuarterlyYoy', 'revenueGrowthTTMYoy', 'revenuePerShareAnnual', 'revenuePerShareTTM', 'revenueShareGrowth5Y', 'roa5Y', 'roaRfy', 'roaTTM', 'roe5Y', 'roeRfy', 'roeTTM', 'roi5Y', 'roiAnnual', 'roiTTM', 'tangibleBookValuePerShareAnnual', 'tangibleBookValuePerShareQuarterly', 'tbvCagr5Y', 'totalDebt/totalEquityAnnual', 'totalDebt/totalEquityQuarterly', 'yearToDatePriceReturnDaily'",
             ] = None,
-        ) -> str:
+        ) -> dict:
             """Get the most recent basic financial data for a company using its stock ticker symbol, with optional specific financial metrics."""
 
-            columns = selected_columns if selected_columns else 'all'
+            basic_financials = self._fetch_basic_financials(symbol)
+            if not selected_columns:
+                return self.latest_metric_index(basic_financials)
 
-            basic_financials = self.finnhub_client.company_basic_financials(symbol, columns)
-            if not basic_financials["series"]:
-                return f"Failed to find basic financials for symbol {symbol} from finnhub! Try a different symbol."
+            # Only look at the requested metrics instead of merging every series first
+            metrics = basic_financials["metric"]
+            quarterly = basic_financials["series"].get("quarterly", {})
+            output_dict = {}
+            for column in selected_columns:
+                value_list = quarterly.get(column)
+                if value_list:
+                    output_dict[column] = value_list[0]["v"]
+                elif column in metrics:
+                    output_dict[column] = metrics[column]
 
-            output_dict = basic_financials["metric"]
-            for metric, value_list in basic_financials["series"]["quarterly"].items():
-                if value_list: 
-                    value = value_list[0]
-                    output_dict.update({metric: value["v"]})
+            return output_dict
 
-            if selected_columns:
-                output_dict = {k: v for k, v in output_dict.items() if k in selected_columns}
-            
-            
-            return json.dumps(output_dict, indent=2)
+    def get_basic_financials_index(self, symbol: Annotated[str, "ticker symbol"]) -> dict:
+        """Get the latest value of every basic financial metric of a company, to be filtered with `select_metrics`."""
+        return self.latest_metric_index(self._fetch_basic_financials(symbol))
+
+    def _fetch_basic_financials(self, symbol: str) -> dict:
+        # Finnhub's `metric` parameter selects a metric group, not columns, so always ask for 'all'
+        basic_financials = self.finnhub_client.company_basic_financials(symbol, 'all')
+        if not basic_financials["series"]:
+            raise ValueError(f"Failed to find basic financials for symbol {symbol} from finnhub! Try a different symbol.")
+        return basic_financials
+
+    @staticmethod
+    def latest_metric_index(basic_financials: dict) -> dict:
+        """Overlay the latest quarterly value of every series on the current metric snapshot."""
+        index = dict(basic_financials["metric"])
+        for metric, value_list in basic_financials["series"].get("quarterly", {}).items():
+            if value_list:
+                index[metric] = value_list[0]["v"]
+        return index
+
+    @staticmethod
+    def select_metrics(index: dict, selected_columns: Optional[List[str]] = None) -> dict:
+        """Pick the requested metrics out of a `latest_metric_index`, or all of them if none are requested."""
+        if not selected_columns:
+            return index
+        return {column: index[column] for column in selected_columns if column in index}
 
     def get_sec_filing(self,
                         symbol: Annotated[str, "ticker symbol"], 
                         form: Annotated[str, "Form type from the list : '10-k', '10-q', '8-k'.. "] = "10-K", 
-                        from_date: Annotated[str, "From date, format yyyy-mm-dd"] = today(12), 
-                        to_date: Annotated[str, "To date, format yyyy-mm-dd"] = today(),
+                        from_date: Annotated[Optional[str], "From date, format yyyy-mm-dd, defaults to a year ago"] = None, 
+                        to_date: Annotated[Optional[str], "To date, format yyyy-mm-dd, defaults to today"] = None,
                         ) -> str:
         """Obtain the most recent SEC filing for a company specified by its stock ticker, within a given date range."""
+
+        from_date = from_date or today(12)
+        to_date = to_date or today()
         
         params = {
             'symbol': symbol,
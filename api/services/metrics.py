@@ -0,0 +1,83 @@
+import os
+import time
+import contextvars
+from typing import Optional
+from api.utils.metrics import Counter, Gauge, Histogram, MultiprocessRegistry, SlowRequestSampler, registry
+
+## Application metrics, scraped from /metrics. Routes are labelled by their path
+## template, upstream calls by provider and service method, e.g. FinnhubUtils.get_quote.
+REQUEST_DURATION = Histogram("api_request_duration_seconds", "Time to fully answer a request, streamed bodies included.", ("route", "method"))
+REQUESTS = Counter("api_requests_total", "Answered requests by status code.", ("route", "method", "status"))
+REQUESTS_IN_FLIGHT = Gauge("api_requests_in_flight", "Requests being answered.", ("route",))
+ERRORS = Counter("api_errors_total", "Failed requests and snapshot sections by exception type.", ("route", "error"))
+
+UPSTREAM_DURATION = Histogram("api_upstream_call_duration_seconds", "Time spent in one attempt of a blocking upstream call in its worker thread; rate limit waits, thread queueing and retry backoff are not included, each retry is observed on its own.", ("provider", "method"))
+UPSTREAM_QUEUE_WAIT = Histogram("api_upstream_queue_wait_seconds", "Time an upstream call waited for a free worker thread.", ("provider",))
+UPSTREAM_IN_FLIGHT = Gauge("api_upstream_calls_in_flight", "Upstream calls queued or running.", ("provider",))
+UPSTREAM_ERRORS = Counter("api_upstream_errors_total", "Failed upstream calls by exception type.", ("provider", "method", "error"))
+
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar("current_route", default="background")
+
+def record_error(e: Exception) -> None:
+    """Count an error against the route being served, or 'background' outside of a request."""
+    ERRORS.inc(route=current_route.get(), error=type(e).__name__)
+
+def build_sampler() -> SlowRequestSampler:
+    """Trace requests slower than SLOW_REQUEST_SECONDS; tracing is off when it is not set."""
+    threshold = os.getenv("SLOW_REQUEST_SECONDS")
+    return SlowRequestSampler(float(threshold) if threshold else None, max_samples=int(os.getenv("SLOW_REQUEST_SAMPLES", 50)))
+
+slow_requests = build_sampler()
+
+def build_multiprocess_registry() -> Optional[MultiprocessRegistry]:
+    """Report every worker from /metrics when METRICS_DIR is set, as api.serve does; only this process otherwise."""
+    directory = os.getenv("METRICS_DIR")
+    if not directory:
+        return None
+    return MultiprocessRegistry(registry, directory, interval=float(os.getenv("METRICS_WRITE_INTERVAL", 5)))
+
+multiprocess_registry = build_multiprocess_registry()
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request, until the last byte of a streamed body."""
+
+    def __init__(self, app, sampler: SlowRequestSampler = slow_requests):
+        self.app = app
+        self.sampler = sampler
+        self._paths: Optional[set] = None
+
+    def route(self, scope) -> str:
+        # Label by known route paths only, so unknown URLs cannot blow up the label cardinality
+        if self._paths is None:
+            self._paths = {route.path for route in scope["app"].routes}
+        return scope["path"] if scope["path"] in self._paths else "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = self.route(scope)
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        route_token = current_route.set(route)
+        trace_token = self.sampler.start(route)
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(route=route)
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            record_error(e)
+            raise
+        finally:
+            REQUESTS_IN_FLIGHT.dec(route=route)
+            REQUEST_DURATION.observe(time.perf_counter() - start, route=route, method=method)
+            REQUESTS.inc(route=route, method=method, status=str(status))
+            self.sampler.finish(trace_token, method=method, status=status, query=scope.get("query_string", b"").decode("latin-1"))
+            current_route.reset(route_token)
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Annotated, Any, Callable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from api.services.finnhub import FinnhubUtils
+
+## Incremental news ingestion. Each symbol keeps a bounded buffer of the articles seen so
+## far and the timestamp of the newest one, so refreshes only ask finnhub for the days
+## since then and only keep articles that were not seen before. The buffers live in a
+## store: in this process's memory, or in a SQLite file shared by every worker, so a
+## next_cursor handed out by one worker pages the same articles on any other.
+class SymbolNews:
+    def __init__(self, buffer_size: int):
+        self.articles: deque = deque()
+        self.ids: set = set()
+        self.buffer_size = buffer_size
+        self.last_seen: Optional[int] = None
+
+    def add(self, article: dict) -> bool:
+        if article["id"] in self.ids:
+            return False
+        if len(self.articles) >= self.buffer_size:
+            self.ids.discard(self.articles.popleft()["id"])
+        self.articles.append(article)
+        self.ids.add(article["id"])
+        if self.last_seen is None or article["datetime"] > self.last_seen:
+            self.last_seen = article["datetime"]
+        return True
+
+def sort_key(article: dict) -> Tuple[int, str]:
+    return article["datetime"], article["id"]
+
+class MemoryNewsStore:
+    """Ring buffers in this process, the least recently used symbol is dropped first."""
+
+    blocking = False
+
+    def __init__(
+        self,
+        buffer_size: Annotated[int, "articles kept per symbol"] = 500,
+        max_symbols: Annotated[int, "symbols with a buffer, the least recently used one is dropped first"] = 1000,
+    ):
+        self.buffer_size = buffer_size
+        self.max_symbols = max_symbols
+        # Ingestion results cached under this name are only valid for this process's buffers
+        self.name = f"memory:{uuid.uuid4().hex}"
+        self._symbols: "OrderedDict[str, SymbolNews]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _feed(self, symbol: str, create: bool = False) -> Optional[SymbolNews]:
+        """The buffer of `symbol`; only ingestion creates one, so reads of unknown symbols allocate nothing."""
+        feed = self._symbols.get(symbol)
+        if feed is None:
+            if not create:
+                return None
+            feed = self._symbols[symbol] = SymbolNews(self.buffer_size)
+            while len(self._symbols) > self.max_symbols:
+                self._symbols.popitem(last=False)
+                self.evictions += 1
+        self._symbols.move_to_end(symbol)
+        return feed
+
+    def last_seen(self, symbol: str) -> Optional[int]:
+        with self._lock:
+            feed = self._feed(symbol)
+            return None if feed is None else feed.last_seen
+
+    def add(self, symbol: str, articles: List[dict]) -> int:
+        with self._lock:
+            feed = self._feed(symbol, create=True)
+            return sum(feed.add(article) for article in articles)
+
+    def older(self, symbol: str, before: Optional[Tuple[int, str]], limit: int) -> List[dict]:
+        with self._lock:
+            feed = self._feed(symbol)
+            if feed is None:
+                return []
+            if before is None:
+                candidates = list(feed.articles)
+            else:
+                candidates = [article for article in feed.articles if sort_key(article) < before]
+        # A heap keeps this O(n log limit) however large the buffer is
+        return heapq.nlargest(limit, candidates, key=sort_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._symbols.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "symbols": len(self._symbols),
+                "evictions": self.evictions,
+                "articles": sum(len(feed.articles) for feed in self._symbols.values()),
+            }
+
+class SQLiteNewsStore:
+    """Buffers in a SQLite file shared by every worker, the symbol ingested the longest ago is dropped first."""
+
+    # Every call reads or writes the file and may wait on another worker's write lock
+    blocking = True
+
+    def __init__(
+        self,
+        path: Annotated[str, "SQLite database file"],
+        buffer_size: Annotated[int, "articles kept per symbol"] = 500,
+        max_symbols: Annotated[int, "symbols with a buffer"] = 1000,
+    ):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.max_symbols = max_symbols
+        self.name = f"sqlite:{os.path.abspath(path)}"
+        self.evictions = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS news (symbol TEXT NOT NULL, id TEXT NOT NULL, datetime INTEGER NOT NULL, article TEXT NOT NULL, PRIMARY KEY (symbol, id))")
+            conn.execute("CREATE INDEX IF NOT EXISTS news_symbol_datetime ON news (symbol, datetime, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS news_symbols (symbol TEXT PRIMARY KEY, ingested_at REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def last_seen(self, symbol: str) -> Optional[int]:
+        return self._connect().execute("SELECT MAX(datetime) FROM news WHERE symbol = ?", (symbol,)).fetchone()[0]
+
+    def add(self, symbol: str, articles: List[dict]) -> int:
+        with self._connect() as conn:
+            added = 0
+            for article in articles:
+                added += conn.execute(
+                    "INSERT OR IGNORE INTO news (symbol, id, datetime, article) VALUES (?, ?, ?, ?)",
+                    (symbol, article["id"], article["datetime"], json.dumps(article)),
+                ).rowcount
+            conn.execute(
+                "DELETE FROM news WHERE symbol = ? AND rowid IN (SELECT rowid FROM news WHERE symbol = ? ORDER BY datetime DESC, id DESC LIMIT -1 OFFSET ?)",
+                (symbol, symbol, self.buffer_size),
+            )
+            conn.execute("INSERT OR REPLACE INTO news_symbols (symbol, ingested_at) VALUES (?, ?)", (symbol, time.time()))
+            evicted = [row[0] for row in conn.execute("SELECT symbol FROM news_symbols ORDER BY ingested_at DESC LIMIT -1 OFFSET ?", (self.max_symbols,))]
+            for evicted_symbol in evicted:
+                conn.execute("DELETE FROM news WHERE symbol = ?", (evicted_symbol,))
+                conn.execute("DELETE FROM news_symbols WHERE symbol = ?", (evicted_symbol,))
+            self.evictions += len(evicted)
+        return added
+
+    def older(self, symbol: str, before: Optional[Tuple[int, str]], limit: int) -> List[dict]:
+        if before is None:
+            rows = self._connect().execute(
+                "SELECT article FROM news WHERE symbol = ? ORDER BY datetime DESC, id DESC LIMIT ?", (symbol, limit)
+            )
+        else:
+            rows = self._connect().execute(
+                "SELECT article FROM news WHERE symbol = ? AND (datetime, id) < (?, ?) ORDER BY datetime DESC, id DESC LIMIT ?",
+                (symbol, *before, limit),
+            )
+        return [json.loads(row[0]) for row in rows]
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM news")
+            conn.execute("DELETE FROM news_symbols")
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        return {
+            "symbols": conn.execute("SELECT COUNT(*) FROM news_symbols").fetchone()[0],
+            "evictions": self.evictions,
+            "articles": conn.execute("SELECT COUNT(*) FROM news").fetchone()[0],
+        }
+
+def build_news_store():
+    """Select the news store from NEWS_BACKEND: 'memory', or 'sqlite' to share ingested news between worker processes."""
+    buffer_size = int(os.getenv("NEWS_BUFFER_SIZE", 500))
+    max_symbols = int(os.getenv("NEWS_MAX_SYMBOLS", 1000))
+    backend = os.getenv("NEWS_BACKEND", "memory")
+    if backend == "sqlite":
+        return SQLiteNewsStore(os.getenv("NEWS_SQLITE_PATH", "api_news.sqlite3"), buffer_size, max_symbols)
+    if backend == "memory":
+        return MemoryNewsStore(buffer_size, max_symbols)
+    raise ValueError(f"Invalid news backend {backend}. Please specify either 'memory' or 'sqlite'.")
+
+class NewsIngestor:
+    def __init__(
+        self,
+        store=None,
+        lookback_days: Annotated[int, "days fetched the first time a symbol is ingested"] = 7,
+    ):
+        self.store = store if store is not None else MemoryNewsStore()
+        self.lookback_days = lookback_days
+
+    @staticmethod
+    def article_id(article: dict) -> str:
+        """Stable id of an article, so the same story syndicated twice is only kept once."""
+        key = article.get("url") or article.get("headline", "")
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    def ingest(self, finnhub_utils: "FinnhubUtils", symbol: Annotated[str, "ticker symbol"]) -> int:
+        """Fetch the articles published since the last ingestion of `symbol` and return how many were new."""
+        last_seen = self.store.last_seen(symbol)
+        if last_seen is None:
+            start = datetime.now(timezone.utc) - timedelta(days=self.lookback_days)
+        else:
+            # finnhub filters by UTC day, so re-ask for the day of the newest article and drop what was already seen
+            start = datetime.fromtimestamp(last_seen, tz=timezone.utc)
+        raw_news = finnhub_utils.get_raw_company_news(symbol, start.strftime("%Y-%m-%d"), datetime.now(timezone.utc).strftime("%Y-%m-%d"))
+
+        articles = [
+            {"id": self.article_id(raw), "datetime": raw["datetime"], **finnhub_utils.format_news(raw)}
+            for raw in sorted(raw_news, key=lambda n: n["datetime"])
+            if last_seen is None or raw["datetime"] >= last_seen
+        ]
+        return self.store.add(symbol, articles)
+
+    @staticmethod
+    def encode_cursor(article: dict) -> str:
+        return f"{article['datetime']}-{article['id']}"
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[int, str]:
+        try:
+            timestamp, article_id = cursor.split("-", 1)
+            return int(timestamp), article_id
+        except ValueError:
+            raise ValueError(f"Invalid cursor {cursor}.")
+
+    def page(
+        self,
+        symbol: Annotated[str, "ticker symbol"],
+        limit: Annotated[int, "maximum number of articles to return"] = 20,
+        cursor: Annotated[Optional[str], "next_cursor of the previous page, None for the newest articles"] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Return up to `limit` articles older than `cursor`, newest first, and the cursor of the next page."""
+        before = None if cursor is None else self.decode_cursor(cursor)
+        articles = self.store.older(symbol, before, limit + 1)
+        next_cursor = self.encode_cursor(articles[limit - 1]) if len(articles) > limit else None
+        return articles[:limit], next_cursor
+
+    def latest(self, symbol: Annotated[str, "ticker symbol"], limit: int = 10) -> List[dict]:
+        return self.page(symbol, limit)[0]
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def stats(self) -> dict:
+        return {"backend": type(self.store).__name__, **self.store.stats()}
+
+news_ingestor = NewsIngestor(build_news_store(), lookback_days=int(os.getenv("NEWS_LOOKBACK_DAYS", 7)))
+
+async def read_news(method: Callable[..., Any], *args) -> Any:
+    """Call a news_ingestor read without blocking the event loop when the store is a shared file."""
+    if news_ingestor.store.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
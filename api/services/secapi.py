@@ -1,10 +1,21 @@
+import os
 from typing import Annotated
 import sys
-from sec_api import ExtractorApi
+
+class SectionUnavailable(Exception):
+    """Raised when sec-api.io answers with an empty section or its `processing` placeholder instead of the text."""
+
+SECTIONS = ["1", "1A", "1B", "2", "3", "4", "5", "6", "7", "7A", "8", "9", "9A", "9B", "10", "11", "12", "13", "14", "15"]
 
 class SecApiUtils:
     def __init__(self, api_key: str):
+        # sec_api pulls in its whole client on import, only pay for it once a section is extracted
+        from sec_api import ExtractorApi
         self.sec_api_extractor = ExtractorApi(api_key=api_key)
+        # Point the extractor at a different endpoint, e.g. a local fake upstream for benchmarks
+        api_url = os.getenv("SEC_API_EXTRACTOR_URL")
+        if api_url:
+            self.sec_api_extractor.api_endpoint = f"{api_url}?token={api_key}"
 
     def get_10k_section(
         self,
@@ -22,18 +33,15 @@ class SecApiUtils:
         """
         if isinstance(section, int):
             section = str(section)
-        if section not in [
-            "1A",
-            "1B",
-            "7A",
-            "9A",
-            "9B",
-        ] + [str(i) for i in range(1, 16)]:
+        if section not in SECTIONS:
             raise ValueError(
                 "Section must be in [1, 1A, 1B, 2, 3, 4, 5, 6, 7, 7A, 8, 9, 9A, 9B, 10, 11, 12, 13, 14, 15]"
             )
 
         section_text = self.sec_api_extractor.get_section(html_report_url, section, "text")
+        # Sections are stored for good, so never return something that is not the section itself
+        if not section_text.strip() or section_text.strip().lower() == "processing":
+            raise SectionUnavailable(f"Section {section} of {html_report_url} is not available yet, try again later.")
 
         return section_text
 
@@ -0,0 +1,95 @@
+import os
+import json
+import asyncio
+from typing import Annotated, AsyncIterator, List, Tuple
+from api.services.clients import get_secapi_utils
+from api.services.secapi import SECTIONS
+from api.services.upstream import run_upstream
+from api.utils.cache import CachePolicy, ResponseCache
+from api.utils.chunker import build_index, chunk_spans
+from api.utils.section_store import SectionStore
+
+## Extracted 10-K sections are paid, slow calls on immutable documents: each
+## (filing URL, section) is extracted once, stored on disk and served from there.
+section_store = SectionStore(os.getenv("SECTION_STORE_DIR", ".sec_sections"))
+section_cache = ResponseCache(section_store, {
+    "10k_section": CachePolicy(ttl=float("inf")),
+    # Paragraph index of a stored section, as JSON, so chunks can be located without rescanning the text
+    "10k_section_index": CachePolicy(ttl=float("inf")),
+}, name="sections", lease_ttl=120)
+
+async def get_10k_section(
+    api_key: Annotated[str, "sec-api.io API key"],
+    html_report_url: Annotated[str, "URL of the 10-K report .htm"],
+    section: Annotated[str, "section of the 10-K report"],
+) -> str:
+    """Serve a 10-K section from the store, extracting it through sec-api.io on the first request only."""
+    if section not in SECTIONS:
+        raise ValueError(f"Section must be in [{', '.join(SECTIONS)}]")
+    secapi_utils = get_secapi_utils(api_key)
+    return await section_cache.get_or_fetch(
+        "10k_section",
+        (html_report_url, section),
+        lambda: run_upstream("secapi", secapi_utils.get_10k_section, section, html_report_url),
+    )
+
+def invalidate_10k_section(html_report_url: str, section: str) -> bool:
+    """Drop a stored section and its paragraph index so the next request extracts it again; False if it was not stored."""
+    if section not in SECTIONS:
+        raise ValueError(f"Section must be in [{', '.join(SECTIONS)}]")
+    stored = section_store.has(section_cache.make_key("10k_section", (html_report_url, section)))
+    section_cache.invalidate("10k_section", (html_report_url, section))
+    section_cache.invalidate("10k_section_index", (html_report_url, section))
+    return stored
+
+def missing_sections(html_report_url: str) -> List[str]:
+    return [section for section in SECTIONS if not section_store.has(section_cache.make_key("10k_section", (html_report_url, section)))]
+
+async def prefetch_10k_sections(api_key: str, html_report_url: str, sections: List[str]) -> None:
+    """Extract the given sections of a filing into the store, as a background task."""
+    results = await asyncio.gather(
+        *(get_10k_section(api_key, html_report_url, section) for section in sections),
+        return_exceptions=True,
+    )
+    failed = [section for section, result in zip(sections, results) if isinstance(result, Exception)]
+    if failed:
+        print(f"Failed to prefetch sections {failed} of {html_report_url}")
+
+async def ensure_10k_section(api_key: str, html_report_url: str, section: str) -> str:
+    """Make sure a section is in the store, without reading it back if it already is, and return its key."""
+    key = section_cache.make_key("10k_section", (html_report_url, section))
+    if not section_store.has(key):
+        await get_10k_section(api_key, html_report_url, section)
+    return key
+
+def _build_section_index(key: str) -> str:
+    text, _ = section_store.get(key)
+    return json.dumps(build_index(text.encode("utf-8")))
+
+async def get_10k_section_chunks(
+    api_key: str,
+    html_report_url: str,
+    section: str,
+    chunk_tokens: Annotated[int, "approximate size of a chunk in tokens"],
+) -> Tuple[str, List[Tuple[int, int]]]:
+    """Return the store key of a section and the byte spans of its chunks."""
+    key = await ensure_10k_section(api_key, html_report_url, section)
+    index = await section_cache.get_or_fetch(
+        "10k_section_index",
+        (html_report_url, section),
+        lambda: asyncio.to_thread(_build_section_index, key),
+    )
+    return key, chunk_spans(json.loads(index), chunk_tokens)
+
+async def read_10k_section_chunk(key: str, start: int, end: int) -> str:
+    return await asyncio.to_thread(section_store.read_range, key, start, end)
+
+async def stream_10k_section_chunks(key: str, spans: List[Tuple[int, int]]) -> AsyncIterator[str]:
+    """Yield the text of every chunk, read from one pass over the stored section in a worker thread."""
+    chunks = section_store.iter_ranges(key, spans)
+    try:
+        for _ in spans:
+            yield await asyncio.to_thread(next, chunks)
+    finally:
+        # Closes the file even when the client disconnects halfway
+        chunks.close()
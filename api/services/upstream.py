@@ -0,0 +1,118 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Any, Callable, Dict, Optional
+from api.services.metrics import UPSTREAM_DURATION, UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT, UPSTREAM_QUEUE_WAIT
+from api.utils.metrics import current_trace
+from api.utils.ratelimit import BACKGROUND, RequestScheduler, backoff_delay
+
+## The finnhub, yfinance and sec_api clients are blocking. Every call goes through a
+## bounded, per-provider thread pool so a slow provider never stalls the event loop
+## and can only ever hold its own share of worker threads.
+DEFAULT_CONCURRENCY = {
+    "finnhub": 16,
+    "yfinance": 8,
+    "secapi": 4,
+}
+
+class UpstreamExecutor:
+    def __init__(self, provider: Annotated[str, "upstream provider name"], max_concurrency: int):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"upstream-{provider}")
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking upstream call in the provider pool and await its result."""
+        loop = asyncio.get_running_loop()
+        method = getattr(func, "__qualname__", type(func).__name__)
+        submitted = time.perf_counter()
+        started = None
+
+        def call():
+            nonlocal started
+            started = time.perf_counter()
+            return func(*args, **kwargs)
+
+        UPSTREAM_IN_FLIGHT.inc(provider=self.provider)
+        try:
+            return await loop.run_in_executor(self._pool, call)
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(provider=self.provider, method=method, error=type(e).__name__)
+            raise
+        finally:
+            finished = time.perf_counter()
+            UPSTREAM_IN_FLIGHT.dec(provider=self.provider)
+            if started is not None:
+                UPSTREAM_QUEUE_WAIT.observe(started - submitted, provider=self.provider)
+                UPSTREAM_DURATION.observe(finished - started, provider=self.provider, method=method)
+            trace = current_trace.get()
+            if trace is not None:
+                queue_ms = round(((started or finished) - submitted) * 1000, 3)
+                trace.add_span(method, submitted, finished, provider=self.provider, queue_ms=queue_ms)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+def _concurrency(provider: str) -> int:
+    return int(os.getenv(f"{provider.upper()}_MAX_CONCURRENCY", DEFAULT_CONCURRENCY[provider]))
+
+executors: Dict[str, UpstreamExecutor] = {
+    provider: UpstreamExecutor(provider, _concurrency(provider)) for provider in DEFAULT_CONCURRENCY
+}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def retry_delay(e: Exception, attempt: int) -> Optional[float]:
+    """Seconds to back off before retrying a failed upstream HTTP call, None if it should not be retried."""
+    if getattr(e, "status_code", None) not in RETRYABLE_STATUS_CODES:
+        return None
+    response = getattr(e, "response", None)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    return backoff_delay(attempt, retry_after=parse_retry_after(retry_after) if retry_after else None)
+
+def parse_retry_after(value: Annotated[str, "Retry-After header, delay seconds or an HTTP date"]) -> Optional[float]:
+    """Seconds the upstream asked to wait, None when the header cannot be read, so plain backoff applies."""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        # RFC 9110 dates are GMT
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+async def run_upstream(
+    provider: Annotated[str, "one of 'finnhub', 'yfinance', 'secapi'"],
+    func: Callable[..., Any],
+    *args,
+    scheduler: Annotated[Optional[RequestScheduler], "rate limiter to take a token from before every attempt"] = None,
+    priority: Annotated[int, "INTERACTIVE or BACKGROUND, the order in which calls waiting for a token are served"] = BACKGROUND,
+    **kwargs,
+) -> Any:
+    """Await a blocking FinnhubUtils / YFinanceUtils / SecApiUtils call without blocking the event loop.
+
+    With a scheduler, the call waits for a token on the event loop and only then takes a
+    worker thread; 429 and 5xx responses are retried with backoff, also off the pool.
+    """
+    if scheduler is None:
+        return await executors[provider].run(func, *args, **kwargs)
+    for attempt in range(scheduler.max_retries + 1):
+        await scheduler.acquire(priority)
+        try:
+            return await executors[provider].run(func, *args, **kwargs)
+        except Exception as e:
+            delay = retry_delay(e, attempt)
+            if delay is None or attempt == scheduler.max_retries:
+                raise
+        await asyncio.sleep(delay)
+
+def shutdown_executors() -> None:
+    for executor in executors.values():
+        executor.shutdown()
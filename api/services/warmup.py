@@ -0,0 +1,141 @@
+import os
+import time
+import heapq
+import asyncio
+from dataclasses import dataclass
+from typing import Annotated, Awaitable, Callable, Dict, List, Optional
+from api.utils.ratelimit import TokenBucket
+
+## Background warmup of a configured symbol universe. Every (dataset, symbol) pair is
+## fetched once at startup and then refreshed on the dataset's own cadence, so the first
+## user asking about a watched ticker is served from the response cache. All refreshes
+## share one upstream budget, leaving the rest of the quota to interactive traffic.
+@dataclass
+class RefreshJob:
+    dataset: str
+    interval: Annotated[float, "seconds between two refreshes of the same symbol"]
+    fetch: Annotated[Callable[[str], Awaitable], "refreshes the dataset of one symbol"]
+    upstream_calls: Annotated[int, "upstream calls one refresh spends from the budget"] = 1
+
+class WarmupScheduler:
+    def __init__(
+        self,
+        symbols: List[str],
+        jobs: List[RefreshJob],
+        calls_per_minute: Annotated[float, "global upstream budget of the scheduler"] = 30,
+        max_concurrency: Annotated[int, "refreshes running at the same time"] = 4,
+    ):
+        self.symbols = symbols
+        self.jobs = {job.dataset: job for job in jobs}
+        self.budget = TokenBucket(calls_per_minute / 60, capacity=max(1.0, calls_per_minute / 6))
+        self.max_concurrency = max_concurrency
+        self._task: Optional[asyncio.Task] = None
+        self._running: set = set()
+        self.metrics: Dict[str, dict] = {
+            job.dataset: {"runs": 0, "failures": 0, "upstream_calls": 0, "warmed_symbols": set(), "last_run": None, "last_error": None}
+            for job in jobs
+        }
+        self.budget_wait_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def start(self) -> None:
+        if self._task is None and self.symbols and self.jobs:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        tasks = list(self._running) + ([self._task] if self._task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _spend(self, calls: int) -> None:
+        for _ in range(calls):
+            wait = self.budget.try_acquire()
+            while wait > 0:
+                self.budget_wait_seconds += wait
+                await asyncio.sleep(wait)
+                wait = self.budget.try_acquire()
+
+    async def _refresh(self, job: RefreshJob, symbol: str, semaphore: asyncio.Semaphore) -> None:
+        metrics = self.metrics[job.dataset]
+        try:
+            await job.fetch(symbol)
+            metrics["warmed_symbols"].add(symbol)
+        except Exception as e:
+            metrics["failures"] += 1
+            metrics["last_error"] = f"{symbol}: {e}"
+        finally:
+            metrics["runs"] += 1
+            metrics["last_run"] = time.time()
+            semaphore.release()
+
+    async def _run(self) -> None:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        now = time.monotonic()
+        # Warm the interactive datasets first: jobs with the shortest interval come first at startup
+        queue = [
+            (now, job.interval, dataset, symbol)
+            for dataset, job in self.jobs.items()
+            for symbol in self.symbols
+        ]
+        heapq.heapify(queue)
+
+        while True:
+            due, interval, dataset, symbol = heapq.heappop(queue)
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            job = self.jobs[dataset]
+            await semaphore.acquire()
+            await self._spend(job.upstream_calls)
+            self.max_lag_seconds = max(self.max_lag_seconds, time.monotonic() - due)
+            self.metrics[dataset]["upstream_calls"] += job.upstream_calls
+
+            task = asyncio.ensure_future(self._refresh(job, symbol, semaphore))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            heapq.heappush(queue, (due + interval, interval, dataset, symbol))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "symbols": len(self.symbols),
+            "calls_per_minute": self.budget.rate * 60,
+            "budget_wait_seconds": round(self.budget_wait_seconds, 2),
+            "max_lag_seconds": round(self.max_lag_seconds, 2),
+            "datasets": {
+                dataset: {
+                    "interval": self.jobs[dataset].interval,
+                    "runs": metrics["runs"],
+                    "failures": metrics["failures"],
+                    "upstream_calls": metrics["upstream_calls"],
+                    "coverage": len(metrics["warmed_symbols"]) / len(self.symbols) if self.symbols else 0.0,
+                    "last_run": metrics["last_run"],
+                    "last_error": metrics["last_error"],
+                }
+                for dataset, metrics in self.metrics.items()
+            },
+        }
+
+def warmup_symbols() -> List[str]:
+    """Symbol universe from WARMUP_SYMBOLS, a comma-separated list of tickers."""
+    return [symbol.strip().upper() for symbol in os.getenv("WARMUP_SYMBOLS", "").split(",") if symbol.strip()]
+
+_leader_lock = None
+
+def claim_warmup_leadership(lock_path: Annotated[Optional[str], "file locked by the worker running the warmup, None for a single process"]) -> bool:
+    """Elect one worker of a multi-process deployment to run the warmup; it holds the lock until it exits."""
+    global _leader_lock
+    if lock_path is None or _leader_lock is not None:
+        return True
+    import fcntl
+    lock = open(lock_path, "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return False
+    _leader_lock = lock
+    return True
@@ -1,25 +1,38 @@
 import sys
 from typing import Annotated, Any
 from pandas import DataFrame
+import numpy as np
 import pandas as pd
 import yfinance as yf
 
 class YFinanceUtils:
     def __init__(self, symbol: Annotated[str, "ticker symbol"]):
         self.symbol = symbol 
-        self.yfinance_ticker = self.init_yfinance_client(symbol)
     
     def init_yfinance_client(self, symbol: str) -> Any:
         ticker = yf.Ticker(symbol)
         return ticker
+
+    def get_financials(self) -> DataFrame:
+        # yf.Ticker memoizes what it downloads, a failed fetch's empty frame included, so every
+        # fetch uses a new one; all tickers share yfinance's session, so connections are still reused
+        return self.init_yfinance_client(self.symbol).financials
     
     def get_income_stmt(self) -> DataFrame:
         """Retrieve the latest income statement for the stock defined by the initialized ticker symbol."""
-        income_stmt = self.yfinance_ticker.financials
+        income_stmt = self.get_financials()
         income_stmt_df = pd.DataFrame(income_stmt)
         income_stmt_dict = income_stmt_df.transpose().to_dict(orient='index')
         return income_stmt_dict
 
+    def get_income_stmt_columnar(self) -> dict:
+        """Retrieve the latest income statement as a periods array plus one float64 array per line item (NaN for missing values)."""
+        income_stmt = self.get_financials()
+        periods = np.datetime_as_string(pd.DatetimeIndex(income_stmt.columns).values, unit="D").tolist()
+        # Rows of a C-ordered matrix are contiguous, so each line item is a view on the same buffer
+        values = np.ascontiguousarray(income_stmt.to_numpy(dtype=np.float64))
+        return {"periods": periods, "items": dict(zip(income_stmt.index.astype(str), values))}
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python yfinance_utils.py <SYMBOL>")
@@ -0,0 +1,126 @@
+import time
+import asyncio
+import sqlite3
+import threading
+from api.utils.cache import CachePolicy, MemoryBackend, ResponseCache, SQLiteBackend
+
+POLICIES = {"quote": CachePolicy(ttl=60)}
+
+def test_cancelled_first_caller_does_not_fail_collapsed_callers():
+    cache = ResponseCache(MemoryBackend(), POLICIES)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"c": 1.0}
+
+    async def scenario():
+        first = asyncio.create_task(cache.get_or_fetch("quote", ("AAPL",), fetch))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(cache.get_or_fetch("quote", ("AAPL",), fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    first, second = asyncio.run(scenario())
+    assert isinstance(first, asyncio.CancelledError)
+    assert second == {"c": 1.0}
+    assert len(calls) == 1
+    # The fetch still completed and was stored for later callers
+    assert cache.backend.get(ResponseCache.make_key("quote", ("AAPL",)))[0] == {"c": 1.0}
+
+def test_sqlite_backend_purges_expired_and_oldest_entries(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=3, purge_every=1000)
+    now = time.time()
+    backend.set("expired", 1, now - 10, expires_at=now - 1)
+    for i in range(5):
+        backend.set(f"key{i}", i, now + i, expires_at=now + 60)
+
+    assert backend.purge() == 3
+    assert len(backend) == 3
+    assert backend.get("expired") is None
+    assert backend.get("key0") is None and backend.get("key1") is None
+    assert backend.get("key4") == (4, now + 4)
+
+def test_sqlite_backend_purges_every_n_writes(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=2, purge_every=4)
+    for i in range(4):
+        backend.set(f"key{i}", i, time.time())
+    assert len(backend) == 2
+
+def test_sqlite_backend_upgrades_files_without_expiry(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL)")
+        conn.execute("INSERT INTO cache VALUES ('old', x'80034b012e', 0)")
+    backend = SQLiteBackend(path)
+    assert backend.purge() == 1
+    assert len(backend) == 0
+
+def test_sqlite_backend_is_called_off_the_event_loop(tmp_path):
+    threads = []
+
+    class RecordingBackend(SQLiteBackend):
+        def get(self, key):
+            threads.append(threading.current_thread())
+            return super().get(key)
+
+        def set(self, key, value, stored_at, expires_at=None):
+            threads.append(threading.current_thread())
+            super().set(key, value, stored_at, expires_at)
+
+    cache = ResponseCache(RecordingBackend(str(tmp_path / "cache.sqlite3")), POLICIES)
+
+    async def fetch():
+        return {"c": 1.0}
+
+    async def scenario():
+        first = await cache.get_or_fetch("quote", ("AAPL",), fetch)
+        second = await cache.get_or_fetch("quote", ("AAPL",), fetch)
+        return first, second
+
+    assert asyncio.run(scenario()) == ({"c": 1.0}, {"c": 1.0})
+    assert cache.hits == 1
+    assert len(threads) == 3 and threading.main_thread() not in threads
+
+def test_refreshes_are_not_counted_as_lookups():
+    cache = ResponseCache(MemoryBackend(), POLICIES)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"c": float(len(calls))}
+
+    async def scenario():
+        await cache.get_or_fetch("quote", ("AAPL",), fetch)
+        for _ in range(3):
+            await cache.get_or_fetch("quote", ("AAPL",), fetch, refresh=True)
+        return await cache.get_or_fetch("quote", ("AAPL",), fetch)
+
+    assert asyncio.run(scenario()) == {"c": 4.0}
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"], stats["refreshes"]) == (1, 1, 3)
+    assert stats["hit_ratio"] == 0.5
+    assert stats["saved_upstream_calls"] == 1
+
+def test_income_statement_is_cached_once_per_symbol_whatever_its_case(monkeypatch):
+    from types import SimpleNamespace
+    from api.main import fetch_income_statement
+    from api.services.cache import response_cache
+    from api.services.clients import yfinance_clients
+    calls = []
+    monkeypatch.setattr(response_cache, "backend", MemoryBackend())
+    monkeypatch.setattr(yfinance_clients, "factory", lambda symbol: SimpleNamespace(get_income_stmt=lambda: calls.append(symbol) or {"symbol": symbol}))
+    yfinance_clients.clear()
+
+    async def scenario():
+        await fetch_income_statement("AAPL", refresh=True)
+        return await fetch_income_statement("aapl")
+
+    try:
+        assert asyncio.run(scenario()) == {"symbol": "AAPL"}
+    finally:
+        yfinance_clients.clear()
+    assert calls == ["AAPL"]
+    assert len(response_cache.backend) == 1
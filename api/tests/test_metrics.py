@@ -0,0 +1,31 @@
+import os
+import subprocess
+from api.utils.metrics import Counter, Gauge, Histogram, MultiprocessRegistry, Registry
+
+def worker_registry(requests: int, in_flight: int) -> Registry:
+    """The metrics one worker process would have registered."""
+    registry = Registry()
+    counter = Counter("requests_total", "Requests.", ("route",), register=False)
+    gauge = Gauge("in_flight", "Requests being answered.", register=False)
+    histogram = Histogram("duration_seconds", "Request duration.", buckets=(0.1, 1.0), register=False)
+    for metric in (counter, gauge, histogram):
+        registry.register(metric)
+    counter.inc(requests, route="/quote")
+    gauge.set(in_flight)
+    for _ in range(requests):
+        histogram.observe(0.05)
+    return registry
+
+def test_scrape_sums_every_worker_and_reports_gauges_of_live_ones(tmp_path):
+    exited = subprocess.Popen(["true"])
+    exited.wait()
+    replaced_worker = MultiprocessRegistry(worker_registry(requests=3, in_flight=7), str(tmp_path))
+    replaced_worker.path = os.path.join(str(tmp_path), f"{exited.pid}.json")
+    replaced_worker.write()
+
+    lines = MultiprocessRegistry(worker_registry(requests=2, in_flight=1), str(tmp_path)).render().splitlines()
+    assert 'requests_total{route="/quote"} 5' in lines
+    assert 'duration_seconds_bucket{le="0.1"} 5' in lines
+    assert "duration_seconds_sum 0.25" in lines
+    assert f'in_flight{{pid="{os.getpid()}"}} 1' in lines
+    assert not any(line.startswith(f'in_flight{{pid="{exited.pid}"}}') for line in lines)
@@ -0,0 +1,66 @@
+import time
+from types import SimpleNamespace
+from datetime import datetime, timezone
+from api.services.finnhub import FinnhubUtils
+from api.services.news import MemoryNewsStore, NewsIngestor, SQLiteNewsStore
+
+def raw_article(i: int) -> dict:
+    return {"datetime": 1_700_000_000 + i, "headline": f"Headline {i}", "url": f"https://example.com/{i}", "source": "test", "summary": ""}
+
+def fake_finnhub_utils(articles: list) -> SimpleNamespace:
+    return SimpleNamespace(get_raw_company_news=lambda symbol, start, end: articles, format_news=FinnhubUtils.format_news)
+
+def test_reads_of_unknown_symbols_allocate_nothing():
+    ingestor = NewsIngestor()
+    assert ingestor.page("UNKNOWN", 10) == ([], None)
+    assert ingestor.latest("UNKNOWN") == []
+    assert ingestor.stats()["symbols"] == 0
+
+def test_least_recently_used_symbols_are_evicted():
+    ingestor = NewsIngestor(MemoryNewsStore(max_symbols=2))
+    finnhub_utils = fake_finnhub_utils([raw_article(i) for i in range(3)])
+    ingestor.ingest(finnhub_utils, "A")
+    ingestor.ingest(finnhub_utils, "B")
+    ingestor.page("A", 10)
+    ingestor.ingest(finnhub_utils, "C")
+
+    assert ingestor.stats()["symbols"] == 2
+    assert ingestor.stats()["evictions"] == 1
+    assert len(ingestor.latest("A")) == 3
+    assert ingestor.latest("B") == []
+
+def test_cursor_pages_the_same_articles_on_every_worker(tmp_path):
+    path = str(tmp_path / "news.sqlite3")
+    first_worker = NewsIngestor(SQLiteNewsStore(path, buffer_size=8))
+    second_worker = NewsIngestor(SQLiteNewsStore(path, buffer_size=8))
+    finnhub_utils = fake_finnhub_utils([raw_article(i) for i in range(10)] + [raw_article(9)])
+    assert first_worker.ingest(finnhub_utils, "AAPL") == 10
+
+    page, cursor = first_worker.page("AAPL", 5)
+    rest, last_cursor = second_worker.page("AAPL", 5, cursor)
+    assert [article["headline"] for article in page + rest] == [f"Headline {i}" for i in range(9, 1, -1)]
+    assert last_cursor is None
+    assert second_worker.stats()["articles"] == 8
+    # Already seen by the other worker, so nothing is new
+    assert second_worker.ingest(finnhub_utils, "AAPL") == 0
+
+def test_refresh_asks_for_the_utc_day_of_the_newest_article(monkeypatch):
+    # 23:30 UTC is already the next day on a host ahead of UTC
+    newest = int(datetime(2024, 3, 1, 23, 30, tzinfo=timezone.utc).timestamp())
+    requested = []
+
+    def get_raw_company_news(symbol, start, end):
+        requested.append(start)
+        return [{"datetime": newest, "headline": "Late news", "url": "https://example.com/late", "source": "test", "summary": ""}]
+
+    monkeypatch.setenv("TZ", "Pacific/Kiritimati")
+    time.tzset()
+    try:
+        ingestor = NewsIngestor()
+        finnhub_utils = SimpleNamespace(get_raw_company_news=get_raw_company_news, format_news=FinnhubUtils.format_news)
+        ingestor.ingest(finnhub_utils, "AAPL")
+        ingestor.ingest(finnhub_utils, "AAPL")
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert requested[1] == "2024-03-01"
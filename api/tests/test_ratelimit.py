@@ -0,0 +1,92 @@
+import time
+import asyncio
+import pytest
+from types import SimpleNamespace
+from email.utils import formatdate
+from api.benchmarks.fake_upstream import FakeFinnhubServer
+from api.services.upstream import retry_delay
+from api.utils.ratelimit import BACKGROUND, INTERACTIVE, RateLimitExceeded, RequestScheduler
+
+QUOTA = 5
+# Leave headroom under the server's sliding window, as a deployment would
+CALLS_PER_SECOND = QUOTA * 0.8
+
+@pytest.fixture
+def finnhub(monkeypatch):
+    """Fake Finnhub answering 429 above QUOTA calls/s, with the app's scheduler set just under it."""
+    with FakeFinnhubServer(latency=0.01, quota_per_second=QUOTA) as server:
+        monkeypatch.setenv("FINNHUB_API_URL", server.api_url)
+        monkeypatch.setenv("FINNHUB_CALLS_PER_MINUTE", str(CALLS_PER_SECOND * 60))
+        monkeypatch.setenv("FINNHUB_BURST", "1")
+        from api.services.cache import response_cache
+        from api.services.clients import finnhub_clients
+        from api.utils.cache import MemoryBackend
+        monkeypatch.setattr(response_cache, "backend", MemoryBackend())
+        finnhub_clients.clear()
+        yield server
+        finnhub_clients.clear()
+
+def test_interactive_call_skips_queued_background_calls(finnhub):
+    from api.main import fetch_company_news, fetch_quote
+
+    async def scenario():
+        news = [asyncio.create_task(fetch_company_news(f"SYM{i}", "test-key")) for i in range(30)]
+        # Let the news calls queue up for tokens first
+        await asyncio.sleep(0.3)
+        start = time.perf_counter()
+        await fetch_quote("AAPL", "test-key")
+        quote_seconds = time.perf_counter() - start
+        await asyncio.gather(*news)
+        return quote_seconds
+
+    quote_seconds = asyncio.run(scenario())
+    # One token interval, not the ~7 s it takes to drain the news calls
+    assert quote_seconds < 2 / CALLS_PER_SECOND
+    assert finnhub.counters == {"served": 31, "rejected": 0}
+
+def test_queue_is_bounded_by_max_queue_not_by_worker_threads():
+    scheduler = RequestScheduler(rate=1, burst=1, max_queue=40, max_wait=60)
+
+    async def scenario():
+        await scheduler.acquire()
+        waiters = [asyncio.create_task(scheduler.acquire()) for _ in range(50)]
+        await asyncio.sleep(0.05)
+        stats = scheduler.stats()
+        for waiter in waiters:
+            waiter.cancel()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        return stats, results
+
+    stats, results = asyncio.run(scenario())
+    assert stats["queued"] == 40
+    assert sum(isinstance(result, RateLimitExceeded) for result in results) == 10
+
+def test_waiters_are_served_by_priority_then_arrival():
+    scheduler = RequestScheduler(rate=50, burst=1)
+    order = []
+
+    async def call(name: str, priority: int):
+        await scheduler.acquire(priority)
+        order.append(name)
+
+    async def scenario():
+        await scheduler.acquire()
+        tasks = [asyncio.create_task(call(f"background-{i}", BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("interactive", INTERACTIVE)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order == ["interactive", "background-0", "background-1", "background-2"]
+
+def test_retry_after_as_seconds_or_http_date_delays_the_retry():
+    def rate_limited(retry_after: str) -> Exception:
+        error = Exception("429 Too Many Requests")
+        error.status_code = 429
+        error.response = SimpleNamespace(headers={"Retry-After": retry_after})
+        return error
+
+    assert retry_delay(rate_limited("20"), attempt=0) >= 20
+    assert 25 <= retry_delay(rate_limited(formatdate(time.time() + 30, usegmt=True)), attempt=0) <= 30
+    # Unreadable, so plain backoff instead of a ValueError hiding the 429
+    assert retry_delay(rate_limited("soon"), attempt=0) <= 0.5
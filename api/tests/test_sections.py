@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from api.services import sections
+from api.services.clients import secapi_clients
+from api.services.secapi import SecApiUtils, SectionUnavailable
+from api.utils.section_store import SectionStore
+
+URL = "https://www.sec.gov/Archives/edgar/data/0000000/test-10k.htm"
+
+class FakeExtractor:
+    def __init__(self, responses: list):
+        self.responses = responses
+
+    def get_section(self, html_report_url: str, section: str, return_type: str) -> str:
+        return self.responses.pop(0)
+
+@pytest.fixture
+def extractor(monkeypatch, tmp_path):
+    store = SectionStore(str(tmp_path))
+    monkeypatch.setattr(sections, "section_store", store)
+    monkeypatch.setattr(sections.section_cache, "backend", store)
+    extractor = FakeExtractor([])
+
+    def fake_secapi_utils(api_key: str) -> SecApiUtils:
+        utils = SecApiUtils.__new__(SecApiUtils)
+        utils.sec_api_extractor = extractor
+        return utils
+
+    monkeypatch.setattr(secapi_clients, "factory", fake_secapi_utils)
+    secapi_clients.clear()
+    yield extractor
+    secapi_clients.clear()
+
+@pytest.mark.parametrize("placeholder", ["", "  \n", "processing"])
+def test_placeholder_sections_are_not_stored(extractor, placeholder):
+    extractor.responses = [placeholder, "Item 7. Management's discussion."]
+    with pytest.raises(SectionUnavailable):
+        asyncio.run(sections.get_10k_section("key", URL, "7"))
+    assert sections.missing_sections(URL) == sections.SECTIONS
+    assert asyncio.run(sections.get_10k_section("key", URL, "7")) == "Item 7. Management's discussion."
+
+def test_invalidated_sections_are_extracted_again(extractor):
+    extractor.responses = ["First extraction.", "Second extraction."]
+    assert asyncio.run(sections.get_10k_section("key", URL, "7")) == "First extraction."
+    assert asyncio.run(sections.get_10k_section("key", URL, "7")) == "First extraction."
+
+    assert sections.invalidate_10k_section(URL, "7") is True
+    assert sections.invalidate_10k_section(URL, "7") is False
+    assert asyncio.run(sections.get_10k_section("key", URL, "7")) == "Second extraction."
+
+def test_invalidation_requires_the_admin_token(extractor, monkeypatch):
+    from api.main import invalidate_10k_section
+    extractor.responses = ["First extraction."]
+    asyncio.run(sections.get_10k_section("key", URL, "7"))
+
+    for configured, token in [(None, None), (None, "anything"), ("secret", None), ("secret", "wrong")]:
+        if configured is None:
+            monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+        else:
+            monkeypatch.setenv("ADMIN_TOKEN", configured)
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(invalidate_10k_section(URL, "7", x_admin_token=token))
+        assert error.value.status_code == 403
+    assert sections.missing_sections(URL) != sections.SECTIONS
+
+    assert asyncio.run(invalidate_10k_section(URL, "7", x_admin_token="secret"))["invalidated"] is True
+
+def test_iter_ranges_matches_read_range(tmp_path):
+    store = SectionStore(str(tmp_path))
+    text = "".join(f"Paragraph {i} é.\n\n" for i in range(2000))
+    store.set("key", text, 0.0)
+    data = text.encode("utf-8")
+    spans = [(start, min(start + 1000, len(data))) for start in range(0, len(data), 1000)]
+    # Cut on character boundaries, like the chunker does
+    spans = [(start, end) for start, end in spans if not (0x80 <= data[start] < 0xC0) and (end == len(data) or not (0x80 <= data[end] < 0xC0))]
+    assert list(store.iter_ranges("key", spans)) == [store.read_range("key", start, end) for start, end in spans]
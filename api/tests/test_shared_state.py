@@ -0,0 +1,71 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from typing import Callable, List
+from api.utils.cache import CachePolicy, ResponseCache, SQLiteBackend
+from api.utils.ratelimit import SQLiteLedger
+from api.utils.section_store import SectionStore
+
+## State shared by the workers of api.serve, exercised from separate processes that all
+## start at once, the way uvicorn workers hit the same files.
+WORKERS = 4
+POLICIES = {"quote": CachePolicy(ttl=60), "10k_section": CachePolicy(ttl=float("inf"))}
+
+def run_workers(target: Callable, *args) -> List:
+    """Run `target(barrier, results, *args)` in WORKERS fresh processes and return what each put in `results`."""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [context.Process(target=target, args=(barrier, results, *args)) for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    collected = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+    return collected
+
+def take_tokens(barrier, results, path: str) -> None:
+    ledger = SQLiteLedger(path)
+    barrier.wait()
+    # try_acquire returns 0 when it granted a token
+    results.put(sum(ledger.try_acquire("finnhub:key-hash", 0.001, 15) == 0 for _ in range(10)))
+
+def fetch_through_cache(barrier, results, backend_type: str, path: str, endpoint: str, fetches_path: str) -> None:
+    backend = SQLiteBackend(path) if backend_type == "sqlite" else SectionStore(path)
+    cache = ResponseCache(backend, POLICIES)
+
+    async def fetch():
+        with open(fetches_path, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        await asyncio.sleep(0.3)
+        return f"fetched by {os.getpid()}"
+
+    barrier.wait()
+    results.put(asyncio.run(cache.get_or_fetch(endpoint, ("AAPL",), fetch)))
+
+def test_sqlite_ledger_grants_a_key_quota_once_across_processes(tmp_path):
+    grants = run_workers(take_tokens, str(tmp_path / "quota.sqlite3"))
+    assert sum(grants) == 15
+
+def test_sqlite_backend_fetches_once_across_processes(tmp_path):
+    fetches = tmp_path / "fetches"
+    values = run_workers(fetch_through_cache, "sqlite", str(tmp_path / "cache.sqlite3"), "quote", str(fetches))
+    assert len(fetches.read_text().splitlines()) == 1
+    assert len(set(values)) == 1
+
+def test_section_store_extracts_once_across_processes(tmp_path):
+    fetches = tmp_path / "extractions"
+    values = run_workers(fetch_through_cache, "sections", str(tmp_path / "sec_sections"), "10k_section", str(fetches))
+    assert len(fetches.read_text().splitlines()) == 1
+    assert len(set(values)) == 1
+
+def test_section_store_takes_over_a_lease_left_by_a_crashed_process(tmp_path):
+    store = SectionStore(str(tmp_path))
+    assert store.try_lease("10k_section:AAPL", ttl=30)
+    assert not store.try_lease("10k_section:AAPL", ttl=30)
+    # The holder died without releasing it
+    lease = store.path("10k_section:AAPL") + ".lease"
+    os.utime(lease, (time.time() - 60, time.time() - 60))
+    assert store.try_lease("10k_section:AAPL", ttl=30)
@@ -0,0 +1,291 @@
+import time
+import pickle
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Annotated, Any, Awaitable, Callable, Dict, Optional, Tuple
+from api.utils.metrics import Counter
+
+CACHE_LOOKUPS = Counter("api_cache_lookups_total", "Response cache lookups by endpoint and result: hit, stale, miss, collapsed or refresh.", ("cache", "endpoint", "result"))
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: Annotated[float, "seconds an entry is served as fresh"]
+    stale_ttl: Annotated[float, "extra seconds an expired entry is served while it is refreshed in the background"] = 0
+
+class MemoryBackend:
+    """In-memory LRU backend."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: Optional[float] = None) -> None:
+        # Bounded by max_entries, expired entries are simply evicted last
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def try_lease(self, key: str, ttl: float) -> bool:
+        # Only this process uses the entries, and ResponseCache already collapses its own concurrent fetches
+        return True
+
+    def release_lease(self, key: str) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteBackend:
+    """On-disk backend, survives restarts. Values are pickled, so only point it at a file this app owns.
+
+    Every `purge_every` writes, entries past their expiry are deleted and the oldest entries
+    beyond `max_entries` are evicted, so keys that change daily do not grow the file forever.
+    """
+
+    # Every call reads or writes the file and may wait on another worker's write lock
+    blocking = True
+
+    def __init__(
+        self,
+        path: Annotated[str, "SQLite database file"],
+        max_entries: Annotated[int, "rows kept after a purge, oldest evicted first"] = 50_000,
+        purge_every: Annotated[int, "writes between two purges"] = 256,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self._writes = 0
+        self._local = threading.local()
+        conn = self._connect()
+        # Workers start together, so the schema is checked and upgraded under the write lock
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL, expires_at REAL NOT NULL DEFAULT 0)")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+            if "expires_at" not in columns:
+                # Files written before entries expired: their rows go at the first purge
+                conn.execute("ALTER TABLE cache ADD COLUMN expires_at REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self._connect().execute("SELECT value, stored_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: Optional[float] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), stored_at, float("inf") if expires_at is None else expires_at),
+            )
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete expired entries, then the oldest entries beyond max_entries, and return how many were deleted."""
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),)).rowcount
+            deleted += conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        return deleted
+
+    def delete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def try_lease(self, key: str, ttl: Annotated[float, "seconds after which a lease left by a crashed process is taken over"]) -> bool:
+        """Claim the right to fetch `key` for every process sharing this file."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            return conn.execute("INSERT OR IGNORE INTO leases (key, expires_at) VALUES (?, ?)", (key, now + ttl)).rowcount == 1
+
+    def release_lease(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+# How often a process waiting on another process's fetch checks for its result
+LEASE_POLL_INTERVAL = 0.05
+
+class ResponseCache:
+    """TTL cache with per-endpoint policies, stale-while-revalidate and single-flight fetches.
+
+    Fetches are single-flight within the process, and across processes when the backend is
+    shared: the process holding a key's lease fetches it, the others wait for its result.
+    """
+
+    def __init__(
+        self,
+        backend,
+        policies: Dict[str, CachePolicy],
+        name: Annotated[str, "label of the cache in metrics"] = "response",
+        lease_ttl: Annotated[float, "longest a fetch may hold its lease, and others wait for it"] = 30.0,
+    ):
+        self.backend = backend
+        self.name = name
+        self.lease_ttl = lease_ttl
+        self.policies = policies
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.refreshes = 0
+        # Refreshes started by a stale hit, the upstream calls stale hits did not save
+        self.stale_refreshes = 0
+        self.refresh_errors = 0
+        self.shared_waits = 0
+
+    @staticmethod
+    def make_key(endpoint: str, key_parts: tuple) -> str:
+        return endpoint + ":" + repr(key_parts)
+
+    async def get_or_fetch(
+        self,
+        endpoint: Annotated[str, "name of a configured policy"],
+        key_parts: Annotated[tuple, "arguments that identify the response"],
+        fetch: Annotated[Callable[[], Awaitable[Any]], "performs the upstream call on a miss"],
+        refresh: Annotated[bool, "ignore the cached entry and fetch a new one, e.g. from a background refresher; not counted as a lookup"] = False,
+    ) -> Any:
+        policy = self.policies[endpoint]
+        key = self.make_key(endpoint, key_parts)
+        if refresh:
+            # Not a lookup: a scheduled refresh neither hits nor misses, so it stays out of the hit ratio
+            self.refreshes += 1
+            CACHE_LOOKUPS.inc(cache=self.name, endpoint=endpoint, result="refresh")
+            return await asyncio.shield(self._inflight.get(key) or self._start_fetch(key, policy, fetch))
+
+        entry = await self._backend("get", key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < policy.ttl:
+                self.hits += 1
+                CACHE_LOOKUPS.inc(cache=self.name, endpoint=endpoint, result="hit")
+                return value
+            if age < policy.ttl + policy.stale_ttl:
+                self.stale_hits += 1
+                CACHE_LOOKUPS.inc(cache=self.name, endpoint=endpoint, result="stale")
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self.stale_refreshes += 1
+                    self._start_fetch(key, policy, fetch).add_done_callback(self._refresh_done)
+                return value
+
+        if key in self._inflight:
+            self.collapsed += 1
+            CACHE_LOOKUPS.inc(cache=self.name, endpoint=endpoint, result="collapsed")
+            return await asyncio.shield(self._inflight[key])
+
+        self.misses += 1
+        CACHE_LOOKUPS.inc(cache=self.name, endpoint=endpoint, result="miss")
+        # Shielded, so a caller that goes away (a client disconnect, a stopped warmup) does not
+        # cancel the fetch for the callers collapsed onto it
+        return await asyncio.shield(self._start_fetch(key, policy, fetch))
+
+    async def _backend(self, method: str, *args) -> Any:
+        # Backends on disk decompress, unpickle and wait for file locks, so they run in a thread instead of on the event loop
+        if getattr(self.backend, "blocking", False):
+            return await asyncio.to_thread(getattr(self.backend, method), *args)
+        return getattr(self.backend, method)(*args)
+
+    def _start_fetch(self, key: str, policy: CachePolicy, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Run the fetch of `key` as its own task, shared by every caller asking for the key until it completes."""
+        task = asyncio.ensure_future(self._fetch(key, policy, fetch))
+        self._inflight[key] = task
+        # Mark the exception retrieved when every caller went away before it was raised
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return task
+
+    async def _fetch(self, key: str, policy: CachePolicy, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await self._fetch_shared(key, policy, fetch)
+        finally:
+            del self._inflight[key]
+
+    async def _fetch_shared(self, key: str, policy: CachePolicy, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        waiting_since = time.time()
+        while not await self._backend("try_lease", key, self.lease_ttl):
+            # Another process is fetching this key, wait for what it stores
+            await asyncio.sleep(LEASE_POLL_INTERVAL)
+            entry = await self._backend("get", key)
+            if entry is not None and entry[1] >= waiting_since:
+                self.shared_waits += 1
+                return entry[0]
+        try:
+            value = await fetch()
+            stored_at = time.time()
+            await self._backend("set", key, value, stored_at, stored_at + policy.ttl + policy.stale_ttl)
+            return value
+        finally:
+            await self._backend("release_lease", key)
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_errors += 1
+            print(f"Background refresh failed: {task.exception()}")
+
+    def invalidate(self, endpoint: str, key_parts: tuple) -> None:
+        """Drop the entry of `key_parts`. Blocks on backends on disk, so call it from a thread."""
+        self.backend.delete(self.make_key(endpoint, key_parts))
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.stale_hits + self.misses + self.collapsed
+        served = self.hits + self.stale_hits + self.collapsed + self.shared_waits
+        return served / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        served = self.hits + self.stale_hits + self.collapsed + self.shared_waits
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "collapsed": self.collapsed,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "shared_waits": self.shared_waits,
+            "saved_upstream_calls": served - self.stale_refreshes,
+            "hit_ratio": self.hit_ratio(),
+        }
@@ -0,0 +1,54 @@
+import re
+from bisect import bisect_right
+from typing import Annotated, List, Tuple
+
+## Splits long documents into token-sized chunks along paragraph boundaries. The
+## boundaries are computed once per document (`build_index`) and stored, so any chunk
+## can later be located from the index alone without scanning the document again.
+## All offsets are UTF-8 byte offsets.
+
+# Rough size of a token in English text, good enough to size chunks for an LLM context
+BYTES_PER_TOKEN = 4
+# Long paragraphs get extra break points at whitespace roughly this often
+BREAK_EVERY = 512
+
+PARAGRAPH_BREAK = re.compile(rb"\n[ \t\r]*\n\s*")
+
+def build_index(data: Annotated[bytes, "UTF-8 encoded document"]) -> dict:
+    """Return the paragraph starts, extra whitespace break points and byte length of a document."""
+    paragraphs = [0] + [match.end() for match in PARAGRAPH_BREAK.finditer(data) if match.end() < len(data)]
+    breaks = []
+    for start, end in zip(paragraphs, paragraphs[1:] + [len(data)]):
+        position = start + BREAK_EVERY
+        while position < end:
+            # ASCII whitespace is never part of a multi-byte UTF-8 sequence, so this is a safe cut
+            space = data.find(b" ", position, end)
+            if space == -1:
+                break
+            breaks.append(space + 1)
+            position = space + 1 + BREAK_EVERY
+    return {"paragraphs": paragraphs, "breaks": breaks, "length": len(data)}
+
+def chunk_spans(
+    index: Annotated[dict, "output of build_index"],
+    max_tokens: Annotated[int, "approximate size of a chunk in tokens"],
+) -> List[Tuple[int, int]]:
+    """Group a document into [start, end) byte spans of at most `max_tokens`, cutting at paragraphs when possible."""
+    budget = max(1, max_tokens) * BYTES_PER_TOKEN
+    length = index["length"]
+    paragraphs = index["paragraphs"] + [length]
+    any_boundary = sorted(set(paragraphs + index["breaks"]))
+
+    spans = []
+    start = 0
+    while start < length:
+        limit = start + budget
+        end = paragraphs[bisect_right(paragraphs, limit) - 1]
+        if end <= start:
+            end = any_boundary[bisect_right(any_boundary, limit) - 1]
+        if end <= start:
+            # A single unbreakable run longer than the budget becomes its own chunk
+            end = any_boundary[bisect_right(any_boundary, start)]
+        spans.append((start, end))
+        start = end
+    return spans
@@ -1,8 +1,20 @@
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 from datetime import datetime, timedelta
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 SavePathType = Annotated[str, "File path to save data. If None, data is not saved."]
 
 def today(months_before: int = 0) -> str:
     modified_date = datetime.now() - timedelta(days=30.4 * months_before)
     return modified_date.strftime("%Y-%m-%d")
+
+
+def to_columnar(frame: Annotated["pd.DataFrame", "date-indexed frame of numeric columns"]) -> dict:
+    """Convert a date-indexed frame into {dates: [...], columns: {name: [...]}}, with NaN as None."""
+    import numpy as np
+    dates = np.datetime_as_string(frame.index.values, unit="D").tolist()
+    matrix = frame.to_numpy(dtype=np.float64)
+    values = np.where(np.isnan(matrix), None, matrix).T.tolist()
+    return {"dates": dates, "columns": dict(zip(frame.columns, values))}
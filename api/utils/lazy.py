@@ -0,0 +1,69 @@
+import sys
+import time
+import threading
+import importlib
+from types import ModuleType
+from typing import Annotated, Dict, List, Optional
+
+## Deferred imports. pandas, yfinance, finnhub and sec_api cost about a second to import
+## together, and most routes only need one of them, so service modules are imported on
+## first use instead of when api.main is imported. Scripts, benchmarks and tests only pay
+## for what they use; the API server preloads them in the background once it has started.
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access."""
+
+    def __init__(self, name: Annotated[str, "dotted module name"]):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+        self.import_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the module was imported, by this stand-in or by anyone else."""
+        return self._module is not None or self._name in sys.modules
+
+    def load(self) -> ModuleType:
+        if self._module is None:
+            # Requests handled in worker threads may touch the same module at the same time
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    self.import_seconds = time.perf_counter() - start
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.load(), attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r} ({'loaded' if self.loaded else 'not loaded'})>"
+
+lazy_modules: Dict[str, LazyModule] = {}
+
+def lazy_import(name: Annotated[str, "dotted module name"]) -> LazyModule:
+    if name not in lazy_modules:
+        lazy_modules[name] = LazyModule(name)
+    return lazy_modules[name]
+
+def preload(names: Optional[List[str]] = None) -> None:
+    """Import deferred modules right away, e.g. from a server's startup hook so no request pays for them."""
+    if names is not None:
+        for name in names:
+            lazy_import(name).load()
+        return
+    # Loading a module can register more deferred modules
+    while any(not module.loaded for module in lazy_modules.values()):
+        for module in list(lazy_modules.values()):
+            module.load()
+
+def lazy_import_stats() -> dict:
+    """Which deferred modules are loaded, and how long the ones imported through their stand-in took."""
+    return {
+        name: {
+            "loaded": module.loaded,
+            "import_ms": round(module.import_seconds * 1000, 1) if module.import_seconds is not None else None,
+        }
+        for name, module in lazy_modules.items()
+    }
@@ -0,0 +1,355 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Annotated, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+## Minimal Prometheus-style metrics: counters, gauges and histograms with labels, rendered
+## in the text exposition format. Metrics register themselves in the module-level
+## `registry`, the way prometheus_client does, without adding the dependency.
+
+# Latency buckets in seconds, from cache hits (sub-millisecond) to slow upstream calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), register: bool = True):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        if register:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def snapshot(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        """The value of every label set, as plain data another process can merge."""
+        raise NotImplementedError
+
+    def merge(self, snapshots: List[Tuple[int, list]]) -> Tuple[Tuple[str, ...], list]:
+        """Combine the snapshots of several processes, given as (pid, snapshot), into label names and values."""
+        raise NotImplementedError
+
+    def _samples(self, labels: Tuple[str, ...], values: list) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        return self._samples(self.labels, self.snapshot())
+
+    def render(self, labels: Optional[Tuple[str, ...]] = None, values: Optional[list] = None) -> List[str]:
+        """Render this process's values, or the label names and values returned by `merge`."""
+        samples = self.samples() if values is None else self._samples(labels, values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{label_text} {_format_value(value)}" for name, label_text, value in samples]
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def merge(self, snapshots):
+        # Exited processes included, so a counter never goes backwards when a worker is replaced
+        totals: Dict[Tuple[str, ...], float] = {}
+        for _, values in snapshots:
+            for key, value in values:
+                totals[tuple(key)] = totals.get(tuple(key), 0) + value
+        return self.labels, list(totals.items())
+
+    def _samples(self, labels, values):
+        for key, value in values:
+            yield self.name, _format_labels(labels, key), value
+
+class Gauge(_Metric):
+    """Gauge set by the caller, or computed at scrape time by `collect` returning {label values: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.collect = collect
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def snapshot(self):
+        if self.collect is not None:
+            return list(self.collect().items())
+        with self._lock:
+            return list(self._values.items())
+
+    def merge(self, snapshots):
+        # A gauge describes a live process, so each one is reported on its own under a pid label
+        return self.labels + ("pid",), [(tuple(key) + (str(pid),), value) for pid, values in snapshots if _alive(pid) for key, value in values]
+
+    def _samples(self, labels, values):
+        for key, value in values:
+            yield self.name, _format_labels(labels, key), value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def snapshot(self):
+        with self._lock:
+            return [(key, [list(counts), total]) for key, (counts, total) in self._values.items()]
+
+    def merge(self, snapshots):
+        totals: Dict[Tuple[str, ...], list] = {}
+        for _, values in snapshots:
+            for key, (counts, total) in values:
+                entry = totals.setdefault(tuple(key), [[0] * len(counts), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+        return self.labels, list(totals.items())
+
+    def _samples(self, labels, values):
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _format_labels(labels, key, f'le="{_format_value(bound)}"'), cumulative
+            yield f"{self.name}_count", _format_labels(labels, key), cumulative
+            yield f"{self.name}_sum", _format_labels(labels, key), total
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def metrics(self) -> List[_Metric]:
+        return list(self._metrics.values())
+
+registry = Registry()
+
+# Starlette appends "; charset=utf-8" to text media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+## Metrics of several worker processes. Each process writes a snapshot of its registry
+## to its own file in a shared directory, every `interval` seconds and before a scrape;
+## the process answering the scrape merges every file, so /metrics reports all workers
+## whichever one serves it.
+class MultiprocessRegistry:
+    def __init__(
+        self,
+        registry: Registry,
+        directory: Annotated[str, "directory shared by the workers, emptied when the server starts"],
+        interval: Annotated[float, "seconds between two snapshots, how stale other workers' metrics may be"] = 5.0,
+    ):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.path = os.path.join(directory, f"{os.getpid()}.json")
+        self._task: Optional[asyncio.Task] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self) -> None:
+        snapshot = {metric.name: metric.snapshot() for metric in self.registry.metrics()}
+        # Written aside then renamed, so a scrape never reads half a file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+
+    def read(self) -> List[Tuple[int, dict]]:
+        snapshots = []
+        for name in os.listdir(self.directory):
+            pid, ext = os.path.splitext(name)
+            if ext != ".json" or not pid.isdigit():
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append((int(pid), json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self) -> str:
+        """Write this process's snapshot, then render the metrics of every process."""
+        self.write()
+        snapshots = self.read()
+        lines = []
+        for metric in self.registry.metrics():
+            labels, values = metric.merge([(pid, snapshot[metric.name]) for pid, snapshot in snapshots if metric.name in snapshot])
+            lines += metric.render(labels, values)
+        return "\n".join(lines) + "\n"
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await asyncio.to_thread(self.write)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.write)
+            except OSError as e:
+                print(f"Writing metrics failed: {e}")
+
+## Slow-request sampling. A trace collects the spans (upstream calls, formatting,
+## serialization) of one request through a context variable; the sampler keeps the
+## traces of requests that took longer than a threshold.
+class Trace:
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans: List[dict] = []
+
+    def add_span(self, name: str, start: float, end: float, **attributes) -> None:
+        span = {"name": name, "offset_ms": round((start - self.start) * 1000, 3), "duration_ms": round((end - start) * 1000, 3)}
+        span.update(attributes)
+        self.spans.append(span)
+
+current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+@contextmanager
+def span(name: Annotated[str, "what the span measures, e.g. 'FinnhubUtils.get_quote'"], **attributes):
+    """Record a span in the current trace, if the request is being traced."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, start, time.perf_counter(), **attributes)
+
+class SlowRequestSampler:
+    def __init__(
+        self,
+        threshold: Annotated[Optional[float], "seconds above which a request is kept, None disables tracing"],
+        max_samples: Annotated[int, "most recent slow requests kept"] = 50,
+    ):
+        self.threshold = threshold
+        self.samples: deque = deque(maxlen=max_samples)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold is not None
+
+    def start(self, name: str) -> Optional[contextvars.Token]:
+        if not self.enabled:
+            return None
+        return current_trace.set(Trace(name))
+
+    def finish(self, token: Optional[contextvars.Token], **attributes) -> None:
+        if token is None:
+            return
+        trace = current_trace.get()
+        current_trace.reset(token)
+        duration = time.perf_counter() - trace.start
+        if duration >= self.threshold:
+            sample = {"route": trace.name, "duration_ms": round(duration * 1000, 3), "at": time.time(), **attributes}
+            sample["spans"] = sorted(trace.spans, key=lambda span: span["offset_ms"])
+            self.samples.append(sample)
+
+    def recent(self) -> List[dict]:
+        """Slow requests, most recent first."""
+        return list(reversed(self.samples))
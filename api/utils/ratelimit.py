@@ -0,0 +1,268 @@
+import time
+import heapq
+import asyncio
+import random
+import sqlite3
+import hashlib
+import itertools
+import threading
+from typing import Annotated, Dict, Optional
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+class RateLimitExceeded(Exception):
+    """Raised when a call is shed because the scheduler queue is full or the wait would be too long."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    blocking = False
+
+    def __init__(
+        self,
+        rate: Annotated[float, "tokens added per second"],
+        capacity: Annotated[float, "maximum burst size"],
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self) -> float:
+        """Take one token and return 0, or return the seconds until a token is available."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def peek(self) -> float:
+        self._refill(time.monotonic())
+        return self.tokens
+
+## Quota ledgers hold the token buckets of every API key. MemoryLedger keeps them in this
+## process; SQLiteLedger keeps them in a file shared by every worker process on the host,
+## so N workers together stay within one key's quota instead of spending it N times.
+class MemoryLedger:
+    """In-process ledger, for a single worker and for tests."""
+
+    blocking = False
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: str, rate: float, capacity: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, capacity)
+        return bucket
+
+    def try_acquire(self, key: str, rate: float, capacity: float) -> float:
+        with self._lock:
+            return self._bucket(key, rate, capacity).try_acquire()
+
+    def peek(self, key: str, rate: float, capacity: float) -> float:
+        with self._lock:
+            bucket = self._bucket(key, rate, capacity)
+            bucket._refill(time.monotonic())
+            return bucket.tokens
+
+class SQLiteLedger:
+    """Ledger shared by every process opening the same SQLite file. Uses wall clock time, which all processes share."""
+
+    # Calls may wait for another process's write lock, so callers on the event loop run them in a thread
+    blocking = True
+
+    def __init__(self, path: Annotated[str, "SQLite database file"]):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _refill(row, rate: float, capacity: float, now: float) -> float:
+        if row is None:
+            return capacity
+        tokens, updated_at = row
+        return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+    def try_acquire(self, key: str, rate: float, capacity: float) -> float:
+        conn = self._connect()
+        # Take the write lock before reading, so two processes cannot both spend the last token
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = self._refill(row, rate, capacity, now)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait == 0:
+                tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def peek(self, key: str, rate: float, capacity: float) -> float:
+        row = self._connect().execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+        return self._refill(row, rate, capacity, time.time())
+
+class LedgerBucket:
+    """TokenBucket interface over one key of a quota ledger."""
+
+    def __init__(self, ledger, key: Annotated[str, "API key, only its hash is stored"], rate: float, capacity: float):
+        self.ledger = ledger
+        self.key = hashlib.sha256(key.encode()).hexdigest()
+        self.rate = rate
+        self.capacity = capacity
+
+    @property
+    def blocking(self) -> bool:
+        return self.ledger.blocking
+
+    @property
+    def tokens(self) -> float:
+        return self.peek()
+
+    def peek(self) -> float:
+        return self.ledger.peek(self.key, self.rate, self.capacity)
+
+    def try_acquire(self) -> float:
+        """Take one token and return 0, or return the seconds until a token is available."""
+        return self.ledger.try_acquire(self.key, self.rate, self.capacity)
+
+class RequestScheduler:
+    """Token bucket for one API key with a bounded, priority-ordered wait queue.
+
+    Callers wait in `acquire` on the event loop until a token is free, before they take a
+    worker thread, so an interactive call never queues behind background calls in the
+    upstream executor. Lower priority values are served first and callers of equal
+    priority are served in arrival order.
+    """
+
+    def __init__(
+        self,
+        rate: Annotated[float, "calls per second"],
+        burst: Annotated[float, "calls allowed back to back"],
+        max_queue: Annotated[int, "waiting calls before new ones are shed"] = 64,
+        max_wait: Annotated[float, "seconds a call may wait for a token before it is shed"] = 10.0,
+        bucket: Annotated[Optional[LedgerBucket], "shared token bucket, instead of one private to this scheduler"] = None,
+        max_retries: Annotated[int, "retries of a call rejected with 429 or 5xx"] = 3,
+    ):
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self._queue: list = []
+        self._abandoned: set = set()
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+        self.granted = 0
+        self.shed = 0
+
+    def _retry_after(self) -> float:
+        return (len(self._queue) + 1) / self.bucket.rate
+
+    async def _bucket_call(self, method: str) -> float:
+        # A shared ledger is a database round trip that may wait for another worker's lock
+        if self.bucket.blocking:
+            return await asyncio.to_thread(getattr(self.bucket, method))
+        return getattr(self.bucket, method)()
+
+    def _notify(self) -> None:
+        # Wake every waiter so the one now at the head of the queue checks the bucket
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _wait_for_change(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _drop(self, ticket: tuple) -> None:
+        if self._queue and self._queue[0] == ticket:
+            heapq.heappop(self._queue)
+        else:
+            # A higher priority call arrived while this one was taking its token
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+
+    async def acquire(self, priority: int = BACKGROUND) -> None:
+        queued = len(self._queue) - len(self._abandoned)
+        if queued >= self.max_queue:
+            self.shed += 1
+            raise RateLimitExceeded("Upstream request queue is full, try again later.", self._retry_after())
+        # Shed right away rather than queue a call whose wait is bound to exceed max_wait
+        tokens = await self._bucket_call("peek")
+        if (queued + 1 - tokens) / self.bucket.rate > self.max_wait:
+            self.shed += 1
+            raise RateLimitExceeded("Upstream rate limit reached, try again later.", self._retry_after())
+
+        loop = asyncio.get_running_loop()
+        ticket = (priority, next(self._counter))
+        heapq.heappush(self._queue, ticket)
+        deadline = loop.time() + self.max_wait
+        granted = False
+        try:
+            while True:
+                while self._queue and self._queue[0] in self._abandoned:
+                    self._abandoned.discard(heapq.heappop(self._queue))
+
+                wait = None
+                if self._queue[0] == ticket:
+                    wait = await self._bucket_call("try_acquire")
+                    if wait == 0:
+                        self._drop(ticket)
+                        granted = True
+                        self.granted += 1
+                        return
+
+                remaining = deadline - loop.time()
+                if remaining <= 0 or (wait is not None and wait > remaining):
+                    self.shed += 1
+                    raise RateLimitExceeded("Upstream rate limit reached, try again later.", self._retry_after())
+                await self._wait_for_change(min(wait, remaining) if wait is not None else remaining)
+        finally:
+            # A shed or cancelled caller leaves its ticket behind, skipped by whoever reaches it
+            if not granted:
+                self._abandoned.add(ticket)
+            self._notify()
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queue) - len(self._abandoned),
+            "granted": self.granted,
+            "shed": self.shed,
+            "tokens": round(self.bucket.tokens, 2),
+        }
+
+def backoff_delay(
+    attempt: Annotated[int, "number of failed attempts so far, starting at 0"],
+    base: float = 0.5,
+    cap: float = 8.0,
+    retry_after: Optional[float] = None,
+) -> float:
+    """Exponential backoff with full jitter, never shorter than an upstream Retry-After."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
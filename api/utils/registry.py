@@ -0,0 +1,79 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Annotated, Any, Callable, Hashable
+
+class ClientRegistry:
+    """Process-wide LRU/TTL registry of upstream clients, so connections are reused across requests."""
+
+    def __init__(
+        self,
+        factory: Annotated[Callable[[Any], Any], "builds a new client from a key"],
+        max_size: Annotated[int, "maximum number of live clients"] = 64,
+        idle_ttl: Annotated[float, "seconds an unused client is kept alive"] = 900,
+    ):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._clients: "OrderedDict[Hashable, tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the client registered for `key`, creating it on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._clients[key] = (entry[0], now)
+                self._clients.move_to_end(key)
+                return entry[0]
+
+            self.misses += 1
+            client = self.factory(key)
+            self._clients[key] = (client, now)
+            while len(self._clients) > self.max_size:
+                _, (evicted, _) = self._clients.popitem(last=False)
+                self._close(evicted)
+            return client
+
+    def _evict_idle(self, now: float) -> None:
+        # Entries are kept in access order, so idle ones are always at the front
+        while self._clients:
+            key, (client, last_used) = next(iter(self._clients.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            del self._clients[key]
+            self._close(client)
+
+    def _close(self, client: Any) -> None:
+        self.evictions += 1
+        close = getattr(client, "close", None)
+        if close is not None:
+            close()
+
+    def items(self) -> list:
+        with self._lock:
+            return [(key, client) for key, (client, _) in self._clients.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            while self._clients:
+                _, (client, _) = self._clients.popitem(last=False)
+                self._close(client)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._clients),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,118 @@
+import os
+import gzip
+import mmap
+import hashlib
+import time
+import tempfile
+from typing import Annotated, Iterator, List, Optional, Tuple
+
+class SectionStore:
+    """Content-addressed, gzip-compressed on-disk store for extracted filing sections.
+
+    Entries are addressed by the SHA-256 of their key and never change once written, since
+    filings are immutable. It implements the backend interface of `ResponseCache`, so it
+    can be used with an infinite TTL to get single-flight extraction on top of it.
+    """
+
+    # Reads gunzip a whole section
+    blocking = True
+
+    def __init__(self, root: Annotated[str, "directory holding the store"]):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], f"{digest}.txt.gz")
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                # Map the file instead of copying it into a Python buffer before decompressing
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    text = gzip.decompress(mapped).decode("utf-8")
+                return text, os.fstat(f.fileno()).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def read_range(
+        self,
+        key: str,
+        start: Annotated[int, "UTF-8 byte offset, inclusive"],
+        end: Annotated[int, "UTF-8 byte offset, exclusive"],
+    ) -> Optional[str]:
+        """Read part of an entry, only decompressing the stream up to `end`."""
+        try:
+            with open(self.path(key), "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with gzip.GzipFile(fileobj=mapped) as stream:
+                        stream.seek(start)
+                        return stream.read(end - start).decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def iter_ranges(
+        self,
+        key: str,
+        spans: Annotated[List[Tuple[int, int]], "UTF-8 byte ranges in increasing order"],
+    ) -> Iterator[str]:
+        """Read several parts of an entry in one forward pass, decompressing the stream once instead of once per part."""
+        with open(self.path(key), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with gzip.GzipFile(fileobj=mapped) as stream:
+                    for start, end in spans:
+                        # Seeking forward only decompresses the bytes in between
+                        stream.seek(start)
+                        yield stream.read(end - start).decode("utf-8")
+
+    def set(self, key: str, value: str, stored_at: float, expires_at: Optional[float] = None) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(value.encode("utf-8"), compresslevel=6))
+            os.utime(tmp_path, (stored_at, stored_at))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def try_lease(self, key: str, ttl: Annotated[float, "seconds after which a lease left by a crashed process is taken over"]) -> bool:
+        """Claim the extraction of `key` for every process sharing the store directory."""
+        lease = self.path(key) + ".lease"
+        os.makedirs(os.path.dirname(lease), exist_ok=True)
+        for _ in range(2):
+            try:
+                os.close(os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(lease).st_mtime < ttl:
+                        return False
+                    os.unlink(lease)
+                except FileNotFoundError:
+                    pass
+        return False
+
+    def release_lease(self, key: str) -> None:
+        try:
+            os.unlink(self.path(key) + ".lease")
+        except FileNotFoundError:
+            pass
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def __len__(self) -> int:
+        return sum(
+            1 for _, _, files in os.walk(self.root) for name in files if name.endswith(".txt.gz")
+        )
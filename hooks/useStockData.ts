@@ -8,6 +8,7 @@ import {
     fetchCompanyProfile,
     fetchCompanyNews,
     fetchSecFiling,
+    fetchSnapshot,
     // fetch10kSection
 } from '@/lib/tools/tools_calls'
 import type {
@@ -16,7 +17,8 @@ import type {
     CompanyProfileResponse,
     CompanyNewsResponse,
     SecFilingResponse,
-    SecSectionResponse
+    SecSectionResponse,
+    SnapshotResponse
 } from '@/lib/tools/tools_types'
 
 interface ApiKeys {
@@ -73,23 +75,26 @@ export const useSecFiling = (symbol: string, apiKeys: ApiKeys, form?: string, fr
 //     });
 // };
 
+const SNAPSHOT_FINANCIALS_COLUMNS = ['revenueTTm', 'debtEquityTTM', 'peRatioTTM', 'pegRatioTTM', 'priceToBookTTM', 'priceToSalesTTM', 'dividendYieldTTM', 'roeTTM'];
+
+// Fetches all five datasets of a symbol in a single /api/py/snapshot round-trip
 export const useAggregatedStockData = (symbol: string, apiKeys: ApiKeys) => {
-    const incomeStatement = useIncomeStatement(symbol, apiKeys);
-    const basicFinancials = useBasicFinancials(symbol, apiKeys, ['revenueTTm', 'debtEquityTTM', 'peRatioTTM', 'pegRatioTTM', 'priceToBookTTM', 'priceToSalesTTM', 'dividendYieldTTM', 'roeTTM']);
-    const companyProfile = useCompanyProfile(symbol, apiKeys);
-    const companyNews = useCompanyNews(symbol, apiKeys);
-    const secFiling = useSecFiling(symbol, apiKeys, "10-K");
+    const snapshot = useQuery<SnapshotResponse, Error>({
+        queryKey: ['snapshot', symbol],
+        queryFn: () => fetchSnapshot([symbol], apiKeys, SNAPSHOT_FINANCIALS_COLUMNS),
+    });
 
-    const isLoading = [incomeStatement, basicFinancials, companyProfile, companyNews, secFiling].some(query => query.isLoading);
-    const isError = [incomeStatement, basicFinancials, companyProfile, companyNews, secFiling].some(query => query.isError);
+    const sections = snapshot.data?.snapshots[symbol];
+    const isLoading = snapshot.isLoading;
+    const isError = snapshot.isError || (!!sections && Object.values(sections).some(section => section.error !== null));
 
-    const data = {
-        incomeStatement: incomeStatement.data,
-        basicFinancials: basicFinancials.data,
-        companyProfile: companyProfile.data,
-        companyNews: companyNews.data,
-        secFiling: secFiling.data,
-    };
+    const data = useMemo(() => ({
+        incomeStatement: sections?.income_statement.data ? { symbol, income_statement: sections.income_statement.data } as IncomeStatementResponse : undefined,
+        basicFinancials: sections?.basic_financials.data ? { symbol, financials: sections.basic_financials.data } as BasicFinancialsResponse : undefined,
+        companyProfile: sections?.company_profile.data ? { symbol, company_profile: sections.company_profile.data } as CompanyProfileResponse : undefined,
+        companyNews: sections?.company_news.data ? { symbol, news: sections.company_news.data } as CompanyNewsResponse : undefined,
+        secFiling: sections?.sec_filing.data ? { symbol, filing: sections.sec_filing.data } as SecFilingResponse : undefined,
+    }), [sections, symbol]);
 
     return { data, isLoading, isError };
-};
\ No newline at end of file
+};
@@ -1,10 +1,12 @@
 import {
     IncomeStatementResponse,
     SecSectionResponse,
+    SecSectionChunkResponse,
     BasicFinancialsResponse,
     CompanyProfileResponse,
     CompanyNewsResponse,
-    SecFilingResponse
+    SecFilingResponse,
+    SnapshotResponse
 } from "@/lib/tools/tools_types"
 
 
@@ -19,6 +21,7 @@ export const TOOLS_NAMES: ToolsNames = {
     "get_basic_financials_tools": fetchBasicFinancials,
     "get_income_stmt_tool": fetchIncomeStatement,
     // "get_10k_section_tool": fetch10kSection,
+    "get_10k_section_chunk_tool": fetch10kSectionChunk,
     "get_sec_filing_tool": fetchSecFiling
 }
 
@@ -44,23 +47,50 @@ export async function fetchIncomeStatement(symbol: string, apiKeys: ApiKeys): Pr
     return data;
 }
 
-// export async function fetch10kSection(html_report_url: string, section: string): Promise<SecSectionResponse> {
-//     const baseUrl = process.env.NEXT_PUBLIC_API_BASE_URL;
-//     const params = new URLSearchParams({
-//         html_report_url,
-//         section
-//     });
+export async function fetch10kSection(html_report_url: string, section: string, apiKeys: ApiKeys): Promise<SecSectionResponse> {
+    const baseUrl = process.env.NEXT_PUBLIC_API_BASE_URL || '';
+    const params = new URLSearchParams({
+        html_report_url,
+        section
+    });
 
-//     // const response = await fetch(`${baseUrl}/api/py/get_10k_section?${params.toString()}`);
+    const response = await fetch(`${baseUrl}/api/py/get_10k_section?${params.toString()}`, {
+        headers: {
+            'X-Sec-API-Key': apiKeys.secApiKey
+        }
+    });
 
-//     if (!response.ok) {
-//         const errorDetails = await response.json();
-//         throw new Error(`Error fetching 10-K section: ${errorDetails.detail}`);
-//     }
+    if (!response.ok) {
+        const errorDetails = await response.json();
+        throw new Error(`Error fetching 10-K section: ${errorDetails.detail}`);
+    }
+
+    const data: SecSectionResponse = await response.json();
+    return data;
+}
 
-//     const data: SecSectionResponse = await response.json();
-//     return data;
-// }
+export async function fetch10kSectionChunk(html_report_url: string, section: string, chunk: number, apiKeys: ApiKeys): Promise<SecSectionChunkResponse> {
+    const baseUrl = process.env.NEXT_PUBLIC_API_BASE_URL || '';
+    const params = new URLSearchParams({
+        html_report_url,
+        section,
+        chunk: chunk.toString()
+    });
+
+    const response = await fetch(`${baseUrl}/api/py/get_10k_section_chunk?${params.toString()}`, {
+        headers: {
+            'X-Sec-API-Key': apiKeys.secApiKey
+        }
+    });
+
+    if (!response.ok) {
+        const errorDetails = await response.json();
+        throw new Error(`Error fetching 10-K section chunk: ${errorDetails.detail}`);
+    }
+
+    const data: SecSectionChunkResponse = await response.json();
+    return data;
+}
 
 export async function fetchBasicFinancials(symbol: string, apiKeys: ApiKeys, selectedColumns?: string[]): Promise<BasicFinancialsResponse> {
     const baseUrl = process.env.NEXT_PUBLIC_API_BASE_URL || '';
@@ -147,4 +177,28 @@ export async function fetchSecFiling(symbol: string, apiKeys: ApiKeys, form?: st
 
     const data: SecFilingResponse = await response.json();
     return data;
+}
+
+export async function fetchSnapshot(symbols: string[], apiKeys: ApiKeys, selectedColumns?: string[]): Promise<SnapshotResponse> {
+    const baseUrl = process.env.NEXT_PUBLIC_API_BASE_URL || '';
+    const params = new URLSearchParams();
+
+    symbols.forEach(symbol => params.append('symbols', symbol));
+    if (selectedColumns) {
+        selectedColumns.forEach(column => params.append('selected_columns', column));
+    }
+
+    const response = await fetch(`${baseUrl}/api/py/snapshot?${params.toString()}`, {
+        headers: {
+            'X-Finnhub-API-Key': apiKeys.finnhubApiKey
+        }
+    });
+
+    if (!response.ok) {
+        const errorDetails = await response.json();
+        throw new Error(`Error fetching snapshot: ${errorDetails.detail}`);
+    }
+
+    const data: SnapshotResponse = await response.json();
+    return data;
 }
\ No newline at end of file
@@ -183,4 +183,30 @@ const get_10k_section_tool = {
             "required": ["html_report_url", "section"]
         }
     }
-}
\ No newline at end of file
+}
+
+const get_10k_section_chunk_tool = {
+    "type": "function",
+    "function": {
+        "name": "fetch10kSectionChunk",
+        "description": "Get one chunk of a section of a 10-K report, so long sections such as Item 7 or Item 1A can be read piece by piece. The response includes the total number of chunks.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "html_report_url": {
+                    "type": "string",
+                    "description": "URL of the 10-K report HTML file from the SEC EDGAR database."
+                },
+                "section": {
+                    "type": "string",
+                    "description": "Section of the 10-K report to extract. Should be one of: '1', '1A', '1B', '2', '3', '4', '5', '6', '7', '7A', '8', '9', '9A', '9B', '10', '11', '12', '13', '14', '15'."
+                },
+                "chunk": {
+                    "type": "integer",
+                    "description": "Index of the chunk to return, starting at 0."
+                }
+            },
+            "required": ["html_report_url", "section", "chunk"]
+        }
+    }
+}
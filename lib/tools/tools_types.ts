@@ -4,9 +4,8 @@ export interface IncomeStatementResponse {
 }
 
 export interface SecSectionResponse {
-    symbol: string;
+    html_report_url: string;
     section: string;
-    fiscal_year?: string;
     section_text: string;
 }
 
@@ -46,3 +45,29 @@ export interface SecFilingResponse {
     symbol: string;
     filing: SecFiling;
 }
+
+
+export interface SnapshotSection<T> {
+    data: T | null;
+    error: string | null;
+}
+
+export interface SnapshotResponse {
+    snapshots: Record<string, {
+        income_statement: SnapshotSection<any>;
+        basic_financials: SnapshotSection<Record<string, any>>;
+        company_profile: SnapshotSection<string>;
+        company_news: SnapshotSection<CompanyNewsResponse["news"]>;
+        sec_filing: SnapshotSection<SecFiling>;
+    }>;
+}
+
+export interface SecSectionChunkResponse {
+    html_report_url: string;
+    section: string;
+    chunk: number;
+    total_chunks: number;
+    start: number;
+    end: number;
+    text: string;
+}